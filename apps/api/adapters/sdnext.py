@@ -1,59 +1,153 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 import json
-from functools import lru_cache
+import os
+import shutil
+import threading
+import uuid
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
 import httpx
 from fastapi import HTTPException, status
 
-CONFIG_PATH = Path(__file__).resolve().parent.parent / "config.json"
+from ..config import float_option, get_config, int_option, section
+from .txt2img_stream import ImageFiles, StreamDecodeError, Txt2ImgStream
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
 DEFAULT_BASE_URL = "http://127.0.0.1:7860"
 DEFAULT_TIMEOUT = 20.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_HEALTH_INTERVAL = 15.0
+DEFAULT_PROGRESS_INTERVAL = 1.0
+DEFAULT_ENDPOINT_TIMEOUTS: Dict[str, float] = {
+    "health": 5.0,
+    "models": DEFAULT_TIMEOUT,
+    "progress": 5.0,
+    "txt2img": 600.0,
+    "model_load": 600.0,
+}
+DEFAULT_POOL_LIMITS: Dict[str, Any] = {
+    "max_connections": 16,
+    "max_keepalive_connections": 8,
+    "keepalive_expiry": 30.0,
+}
+DEFAULT_HANDOFF_DIR = "runs/.handoff"
+_LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+_IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def _base_url(base_url: Optional[str] = None) -> str:
+    if base_url:
+        return str(base_url).rstrip("/") or DEFAULT_BASE_URL
+    cfg = get_config()
+    base = cfg.get("sdnext_base_url") if isinstance(cfg, dict) else None
+    if not base:
+        return DEFAULT_BASE_URL
+    return str(base).rstrip("/") or DEFAULT_BASE_URL
 
 
-def _load_config() -> Dict[str, Any]:
-    try:
-        raw = CONFIG_PATH.read_text(encoding="utf-8")
-    except FileNotFoundError:
-        return {}
+def backend_configs() -> List[Dict[str, Any]]:
+    """Return the configured SD.Next endpoints, defaulting to ``sdnext_base_url``."""
+    cfg = get_config()
+    entries = cfg.get("sdnext_backends") if isinstance(cfg, dict) else None
+    backends: List[Dict[str, Any]] = []
+    if isinstance(entries, list):
+        for index, entry in enumerate(entries):
+            if isinstance(entry, str):
+                entry = {"base_url": entry}
+            if not isinstance(entry, dict) or not entry.get("base_url"):
+                continue
+            backends.append(
+                {
+                    "name": str(entry.get("name") or f"sdnext-{index}"),
+                    "base_url": _base_url(entry["base_url"]),
+                    "workers": max(1, int_option(entry.get("workers"), 1)),
+                }
+            )
+    if not backends:
+        backends.append({"name": "sdnext", "base_url": _base_url(), "workers": 1})
+    return backends
+
+
+def health_interval() -> float:
+    return float_option(get_config().get("health_interval")) or DEFAULT_HEALTH_INTERVAL
+
+
+def progress_interval() -> float:
+    return float_option(get_config().get("progress_interval")) or DEFAULT_PROGRESS_INTERVAL
+
+
+def _timeout(endpoint: str) -> httpx.Timeout:
+    cfg = get_config()
+    default_value = float_option(cfg.get("timeout")) or DEFAULT_TIMEOUT
+    overrides = cfg.get("timeouts")
+    value = None
+    if isinstance(overrides, dict):
+        value = float_option(overrides.get(endpoint))
+    if value is None:
+        value = DEFAULT_ENDPOINT_TIMEOUTS.get(endpoint, default_value)
+    return httpx.Timeout(value, connect=min(value, DEFAULT_CONNECT_TIMEOUT))
+
+
+def _pool_limits() -> httpx.Limits:
+    cfg = get_config()
+    pool = cfg.get("http_pool")
+    if not isinstance(pool, dict):
+        pool = {}
+    return httpx.Limits(
+        max_connections=int_option(pool.get("max_connections"), DEFAULT_POOL_LIMITS["max_connections"]),
+        max_keepalive_connections=int_option(
+            pool.get("max_keepalive_connections"), DEFAULT_POOL_LIMITS["max_keepalive_connections"]
+        ),
+        keepalive_expiry=float_option(pool.get("keepalive_expiry")) or DEFAULT_POOL_LIMITS["keepalive_expiry"],
+    )
 
-    try:
-        data = json.loads(raw)
-    except json.JSONDecodeError as exc:
-        raise RuntimeError(f"Invalid JSON in {CONFIG_PATH}: {exc}") from exc
 
-    if not isinstance(data, dict):
-        raise RuntimeError(f"Config at {CONFIG_PATH} must be a JSON object")
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
 
-    return data
 
+def _http_client() -> httpx.Client:
+    """Return the process-wide keep-alive client, creating it on first use."""
+    global _client
+    client = _client
+    if client is not None and not client.is_closed:
+        return client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(timeout=_timeout("default"), limits=_pool_limits())
+        return _client
 
-@lru_cache(maxsize=1)
-def _config() -> Dict[str, Any]:
-    return _load_config()
 
+def close() -> None:
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
 
-def _base_url() -> str:
-    cfg = _config()
-    base = cfg.get("sdnext_base_url") if isinstance(cfg, dict) else None
-    if not base:
-        return DEFAULT_BASE_URL
-    return str(base).rstrip("/") or DEFAULT_BASE_URL
 
+_async_client: Optional[httpx.AsyncClient] = None
 
-def _http_client() -> httpx.Client:
-    cfg = _config()
-    timeout_raw = cfg.get('timeout') if isinstance(cfg, dict) else None
-    try:
-        timeout_value = float(timeout_raw) if timeout_raw is not None else None
-    except (TypeError, ValueError):
-        timeout_value = None
-    timeout = httpx.Timeout(timeout_value or DEFAULT_TIMEOUT)
-    return httpx.Client(timeout=timeout)
+
+def _async_http_client() -> httpx.AsyncClient:
+    """Return the event-loop scoped keep-alive client, creating it on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(timeout=_timeout("default"), limits=_pool_limits())
+    return _async_client
+
+
+async def aclose() -> None:
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
 
 
 def _summarize_models(payload: Any) -> Any:
@@ -62,34 +156,91 @@ def _summarize_models(payload: Any) -> Any:
     return payload
 
 
-def health() -> Dict[str, Any]:
-    base = _base_url()
-    with _http_client() as client:
-        try:
-            response = client.get(f"{base}/sdapi/v1/sd-models")
-            response.raise_for_status()
-            return {"ok": True, "endpoint": base, "models": _summarize_models(response.json())}
-        except httpx.HTTPError:
-            pass
+def _backend_unreachable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail="Unable to reach SD.Next backend",
+    )
 
-        try:
-            fallback = client.get(f"{base}/sdapi/v1/progress")
-            fallback.raise_for_status()
-            return {"ok": True, "endpoint": base, "progress": fallback.json()}
-        except httpx.HTTPError as exc:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail="Unable to reach SD.Next backend",
-            ) from exc
 
+def health(base_url: Optional[str] = None) -> Dict[str, Any]:
+    base = _base_url(base_url)
+    client = _http_client()
+    try:
+        response = client.get(f"{base}/sdapi/v1/sd-models", timeout=_timeout("health"))
+        response.raise_for_status()
+        return {"ok": True, "endpoint": base, "models": _summarize_models(response.json())}
+    except httpx.HTTPError:
+        pass
+
+    try:
+        fallback = client.get(f"{base}/sdapi/v1/progress", timeout=_timeout("health"))
+        fallback.raise_for_status()
+        return {"ok": True, "endpoint": base, "progress": fallback.json()}
+    except httpx.HTTPError as exc:
+        raise _backend_unreachable() from exc
+
+
+async def health_async(base_url: Optional[str] = None) -> Dict[str, Any]:
+    base = _base_url(base_url)
+    client = _async_http_client()
+    try:
+        response = await client.get(f"{base}/sdapi/v1/sd-models", timeout=_timeout("health"))
+        response.raise_for_status()
+        return {"ok": True, "endpoint": base, "models": _summarize_models(response.json())}
+    except httpx.HTTPError:
+        pass
+
+    try:
+        fallback = await client.get(f"{base}/sdapi/v1/progress", timeout=_timeout("health"))
+        fallback.raise_for_status()
+        return {"ok": True, "endpoint": base, "progress": fallback.json()}
+    except httpx.HTTPError as exc:
+        raise _backend_unreachable() from exc
 
-def txt2img(params: Dict[str, Any]) -> Tuple[bytes, Dict[str, Any]]:
+
+def progress(base_url: Optional[str] = None) -> Dict[str, Any]:
+    """Return SD.Next's live sampler progress without the base64 preview image."""
+    base = _base_url(base_url)
+    client = _http_client()
+    try:
+        response = client.get(
+            f"{base}/sdapi/v1/progress",
+            params={"skip_current_image": "true"},
+            timeout=_timeout("progress"),
+        )
+        response.raise_for_status()
+        data = response.json()
+    except (httpx.HTTPError, json.JSONDecodeError) as exc:
+        raise _backend_unreachable() from exc
+
+    state = data.get("state") if isinstance(data, dict) else None
+    state = state if isinstance(state, dict) else {}
+    fraction = float_option(data.get("progress")) if isinstance(data, dict) else None
+    eta = float_option(data.get("eta_relative")) if isinstance(data, dict) else None
+    return {
+        "progress": max(0.0, min(1.0, fraction or 0.0)),
+        "eta": eta if eta and eta > 0 else None,
+        "step": int_option(state.get("sampling_step"), 0),
+        "steps": int_option(state.get("sampling_steps"), 0),
+    }
+
+
+def interrupt(base_url: Optional[str] = None) -> None:
+    """Stop the generation SD.Next is running; the pending txt2img call returns early."""
+    base = _base_url(base_url)
+    try:
+        response = _http_client().post(f"{base}/sdapi/v1/interrupt", timeout=_timeout("progress"))
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise _backend_unreachable() from exc
+
+
+def _txt2img_payload(params: Dict[str, Any]) -> Dict[str, Any]:
     prompt = params.get("prompt")
     if not prompt:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="prompt is required")
 
-    base = _base_url()
-
     payload: Dict[str, Any] = {"prompt": prompt}
     optional_fields = (
         "negative_prompt",
@@ -109,46 +260,27 @@ def txt2img(params: Dict[str, Any]) -> Tuple[bytes, Dict[str, Any]]:
     if model:
         payload.setdefault("override_settings", {})
         payload["override_settings"]["sd_model_checkpoint"] = model
+    return payload
 
-    with _http_client() as client:
-        try:
-            response = client.post(f"{base}/sdapi/v1/txt2img", json=payload)
-            response.raise_for_status()
-        except httpx.HTTPError as exc:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail="txt2img request failed",
-            ) from exc
-
-    try:
-        data = response.json()
-    except json.JSONDecodeError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Invalid JSON response from SD.Next",
-        ) from exc
-
-    images = data.get("images") if isinstance(data, dict) else None
-    if not images or not isinstance(images, list):
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="SD.Next response missing images")
 
-    first_image = images[0]
-    if not isinstance(first_image, str):
+def _decode_image(encoded: Any) -> bytes:
+    if not isinstance(encoded, str):
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Invalid image payload from SD.Next")
 
-    if "," in first_image:
-        first_image = first_image.split(",", 1)[1]
+    if "," in encoded:
+        encoded = encoded.split(",", 1)[1]
 
     try:
-        image_bytes = base64.b64decode(first_image)
+        return base64.b64decode(encoded)
     except ValueError as exc:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="Unable to decode SD.Next image payload",
         ) from exc
 
+
+def _parse_info(info: Any) -> Dict[str, Any]:
     meta: Dict[str, Any] = {}
-    info = data.get("info")
     if info:
         if isinstance(info, str):
             try:
@@ -159,78 +291,400 @@ def txt2img(params: Dict[str, Any]) -> Tuple[bytes, Dict[str, Any]]:
             meta = info
         else:
             meta = {"raw_info": info}
+    return meta
+
+
+def _txt2img_result(response: httpx.Response, count: int = 1) -> Tuple[List[bytes], Dict[str, Any]]:
+    try:
+        data = response.json()
+    except json.JSONDecodeError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Invalid JSON response from SD.Next",
+        ) from exc
 
-    return image_bytes, meta
+    images = data.get("images") if isinstance(data, dict) else None
+    if not images or not isinstance(images, list):
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="SD.Next response missing images")
+    if len(images) < count:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"SD.Next returned {len(images)} images for a batch of {count}",
+        )
+
+    return [_decode_image(item) for item in images[:count]], _parse_info(data.get("info"))
+
+
+def batch_meta(meta: Dict[str, Any], index: int, count: int) -> Dict[str, Any]:
+    """Narrow a batched ``info`` blob down to the entry for one image."""
+    item = dict(meta)
+    for plural, singular in (
+        ("all_seeds", "seed"),
+        ("all_subseeds", "subseed"),
+        ("all_prompts", "prompt"),
+        ("all_negative_prompts", "negative_prompt"),
+    ):
+        values = meta.get(plural)
+        if isinstance(values, list) and index < len(values):
+            item[singular] = values[index]
+            item[plural] = [values[index]]
+    infotexts = meta.get("infotexts")
+    if isinstance(infotexts, list) and index < len(infotexts):
+        item["infotexts"] = [infotexts[index]]
+    item["batch"] = {"size": count, "index": index}
+    return item
+
+
+def txt2img(params: Dict[str, Any], base_url: Optional[str] = None) -> Tuple[bytes, Dict[str, Any]]:
+    payload = _txt2img_payload(params)
+    base = _base_url(base_url)
+
+    client = _http_client()
+    try:
+        response = client.post(f"{base}/sdapi/v1/txt2img", json=payload, timeout=_timeout("txt2img"))
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="txt2img request failed",
+        ) from exc
 
+    images, meta = _txt2img_result(response)
+    return images[0], meta
+
+
+def _handoff_root(base: str) -> Optional[Path]:
+    """Directory SD.Next should save into instead of returning images, or ``None`` for HTTP."""
+    cfg = section("image_handoff")
+    mode = str(cfg.get("mode") or "http").lower()
+    if mode == "auto":
+        shared = get_config().get("sdnext_mode") == "managed" and urlparse(base).hostname in _LOCAL_HOSTS
+    else:
+        shared = mode == "shared_fs"
+    return _handoff_dir() if shared else None
+
+
+def _handoff_dir() -> Path:
+    directory = Path(str(section("image_handoff").get("directory") or DEFAULT_HANDOFF_DIR))
+    return directory if directory.is_absolute() else PROJECT_ROOT / directory
+
+
+def clear_handoff() -> None:
+    """Remove per-request handoff directories left behind by a crashed or killed process."""
+    root = _handoff_dir()
+    if not root.is_dir():
+        return
+    for leftover in root.iterdir():
+        # Only our own ``uuid4().hex`` directories; the configured path may be shared.
+        if leftover.is_dir() and len(leftover.name) == 32 and all(c in "0123456789abcdef" for c in leftover.name):
+            shutil.rmtree(leftover, ignore_errors=True)
+
+
+def _stream_payload(params: Dict[str, Any], count: int, handoff: Optional[Path] = None) -> Dict[str, Any]:
+    payload = _txt2img_payload(params)
+    if count > 1:
+        payload["batch_size"] = count
+    if handoff is not None:
+        # Save straight to a per-request directory we can pick the files up from; skip the base64 body.
+        payload["save_images"] = True
+        payload["send_images"] = False
+        payload.setdefault("override_settings", {}).update(
+            {
+                "outdir_samples": str(handoff),
+                "outdir_txt2img_samples": str(handoff),
+                "save_to_dirs": False,
+                "samples_format": "png",
+                "grid_save": False,
+            }
+        )
+    return payload
 
 
-def list_models() -> Dict[str, Any]:
-    base = _base_url()
-    with _http_client() as client:
-        try:
-            response = client.get(f"{base}/sdapi/v1/sd-models")
-            response.raise_for_status()
-        except httpx.HTTPError as exc:
+def _claim_handoff(directory: Path, paths: List[Path]) -> List[str]:
+    """Move the files SD.Next saved in ``directory`` onto ``paths``; returns their original paths."""
+    try:
+        saved = sorted(item for item in directory.iterdir() if item.suffix.lower() in _IMAGE_SUFFIXES)
+    except OSError:
+        saved = []
+    try:
+        if len(saved) < len(paths):
             raise HTTPException(
                 status_code=status.HTTP_502_BAD_GATEWAY,
-                detail="Unable to fetch models from SD.Next",
-            ) from exc
+                detail=f"SD.Next saved {len(saved)} of {len(paths)} images to {directory}; is the filesystem shared?",
+            )
+        for source, destination in zip(saved, paths):
+            try:
+                os.replace(source, destination)
+            except OSError:
+                shutil.move(str(source), str(destination))
+        return [str(source) for source in saved[: len(paths)]]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _handoff_meta(meta: Dict[str, Any], files: List[str]) -> Dict[str, Any]:
+    meta["handoff"] = {"mode": "shared_fs", "files": files}
+    return meta
+
+
+def _stream_meta(parser: Txt2ImgStream, count: int) -> Dict[str, Any]:
+    parser.finish()
+    if parser.images < count:
+        raise StreamDecodeError(
+            f"SD.Next returned {parser.images} images for a batch of {count}"
+            if parser.images
+            else "SD.Next response missing images"
+        )
+    return _parse_info(parser.info)
+
+
+def _discard(files: ImageFiles, handoff: Optional[Path]) -> None:
+    """Remove partial outputs, including anything SD.Next already saved for a failed request."""
+    files.discard()
+    if handoff is not None:
+        shutil.rmtree(handoff, ignore_errors=True)
+
+
+def txt2img_to_files(params: Dict[str, Any], paths: List[Path], base_url: Optional[str] = None) -> Dict[str, Any]:
+    """Render ``len(paths)`` images, decoding each straight from the response stream into its path.
+
+    Returns the backend ``meta`` for the whole batch (see :func:`batch_meta`). Files are removed
+    again if the request or the decode fails. With ``image_handoff`` enabled SD.Next saves the
+    images itself and they are moved into place without crossing HTTP.
+    """
+    count = len(paths)
+    base = _base_url(base_url)
+    root = _handoff_root(base)
+    handoff = root / uuid.uuid4().hex if root else None
+    payload = _stream_payload(params, count, handoff)
+    files = ImageFiles(paths)
+    parser = Txt2ImgStream(files.open)
+
+    client = _http_client()
+    try:
+        with client.stream("POST", f"{base}/sdapi/v1/txt2img", json=payload, timeout=_timeout("txt2img")) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes():
+                parser.feed(chunk)
+        if handoff is not None:
+            meta = _handoff_meta(_stream_meta(parser, 0), _claim_handoff(handoff, paths))
+        else:
+            meta = _stream_meta(parser, count)
+    except httpx.HTTPError as exc:
+        _discard(files, handoff)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="txt2img request failed",
+        ) from exc
+    except StreamDecodeError as exc:
+        _discard(files, handoff)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
+    except BaseException:
+        _discard(files, handoff)
+        raise
+    files.close()
+    return meta
+
+
+async def txt2img_to_file_async(params: Dict[str, Any], path: Path, base_url: Optional[str] = None) -> Dict[str, Any]:
+    """Async single-image variant of :func:`txt2img_to_files`."""
+    base = _base_url(base_url)
+    root = _handoff_root(base)
+    handoff = root / uuid.uuid4().hex if root else None
+    payload = _stream_payload(params, 1, handoff)
+    files = ImageFiles([path])
+    parser = Txt2ImgStream(files.open)
+
+    client = _async_http_client()
+    try:
+        async with client.stream(
+            "POST", f"{base}/sdapi/v1/txt2img", json=payload, timeout=_timeout("txt2img")
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                # Base64 decoding and file writes are blocking; keep them off the event loop.
+                await asyncio.to_thread(parser.feed, chunk)
+        if handoff is not None:
+            claimed = await asyncio.to_thread(_claim_handoff, handoff, [path])
+            meta = _handoff_meta(_stream_meta(parser, 0), claimed)
+        else:
+            meta = _stream_meta(parser, 1)
+    except httpx.HTTPError as exc:
+        _discard(files, handoff)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="txt2img request failed",
+        ) from exc
+    except StreamDecodeError as exc:
+        _discard(files, handoff)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
+    except BaseException:
+        _discard(files, handoff)
+        raise
+    files.close()
+    return meta
+
+
+def _models_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail="Unable to fetch models from SD.Next",
+    )
 
-        try:
-            raw_models = response.json()
-        except json.JSONDecodeError as exc:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail="Invalid SD.Next model list",
-            ) from exc
-
-        items = []
-        if isinstance(raw_models, list):
-            for entry in raw_models:
-                if not isinstance(entry, dict):
-                    continue
-                name = entry.get("model_name") or entry.get("title") or entry.get("hash")
-                if not name:
-                    continue
-                filename = entry.get("filename")
-                resolved_path = None
-                size_bytes = None
-                modified = None
-                if filename:
-                    path_candidate = Path(filename)
-                    try:
-                        resolved = path_candidate if path_candidate.is_absolute() else Path(filename).resolve()
-                        if resolved.exists():
-                            stat = resolved.stat()
-                            resolved_path = str(resolved)
-                            size_bytes = stat.st_size
-                            modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).isoformat()
-                    except OSError:
-                        resolved_path = str(path_candidate)
-                items.append(
-                    {
-                        "name": entry.get("model_name") or entry.get("title") or name,
-                        "title": entry.get("title") or entry.get("model_name") or name,
-                        "hash": entry.get("hash"),
-                        "filename": filename,
-                        "path": resolved_path,
-                        "sizeBytes": size_bytes,
-                        "modified": modified,
-                    }
-                )
 
+def _raw_models(response: httpx.Response) -> Any:
+    try:
+        return response.json()
+    except json.JSONDecodeError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Invalid SD.Next model list",
+        ) from exc
+
+
+def _active_checkpoint(response: httpx.Response) -> Optional[str]:
+    options_payload = response.json()
+    if isinstance(options_payload, dict):
+        return options_payload.get("sd_model_checkpoint")
+    return None
+
+
+_CHECKPOINT_SUFFIXES = (".safetensors", ".ckpt", ".pt", ".bin", ".gguf")
+
+
+def checkpoint_name(value: str) -> str:
+    """``sub/model.safetensors [hash]`` -> ``model``: the part a name and a title share."""
+    name = value.strip()
+    if name.endswith("]") and " [" in name:
+        name = name[: name.rindex(" [")]
+    name = name.replace("\\", "/").rsplit("/", 1)[-1]
+    for suffix in _CHECKPOINT_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def model_matches(loaded: Optional[str], wanted: Optional[str]) -> bool:
+    """True when ``wanted`` (a name or title) refers to the ``loaded`` checkpoint title."""
+    if not wanted:
+        return True
+    return bool(loaded) and (loaded == wanted or checkpoint_name(loaded) == checkpoint_name(wanted))
+
+
+def active_checkpoint(base_url: Optional[str] = None) -> Optional[str]:
+    """The checkpoint SD.Next currently has loaded, from ``/sdapi/v1/options``."""
+    base = _base_url(base_url)
+    try:
+        response = _http_client().get(f"{base}/sdapi/v1/options", timeout=_timeout("models"))
+        response.raise_for_status()
+        return _active_checkpoint(response)
+    except (httpx.HTTPError, json.JSONDecodeError) as exc:
+        raise _backend_unreachable() from exc
+
+
+def load_checkpoint(model: str, base_url: Optional[str] = None) -> None:
+    """Switch SD.Next to ``model``; the request returns once the weights are loaded."""
+    base = _base_url(base_url)
+    try:
+        response = _http_client().post(
+            f"{base}/sdapi/v1/options", json={"sd_model_checkpoint": model}, timeout=_timeout("model_load")
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY, detail=f"SD.Next failed to load {model}"
+        ) from exc
+    except httpx.HTTPError as exc:
+        raise _backend_unreachable() from exc
+
+
+def _model_items(raw_models: Any, active: Optional[str]) -> Dict[str, Any]:
+    items = []
+    if isinstance(raw_models, list):
+        for entry in raw_models:
+            if not isinstance(entry, dict):
+                continue
+            name = entry.get("model_name") or entry.get("title") or entry.get("hash")
+            if not name:
+                continue
+            filename = entry.get("filename")
+            resolved_path = None
+            size_bytes = None
+            modified = None
+            if filename:
+                path_candidate = Path(filename)
+                try:
+                    resolved = path_candidate if path_candidate.is_absolute() else Path(filename).resolve()
+                    if resolved.exists():
+                        stat = resolved.stat()
+                        resolved_path = str(resolved)
+                        size_bytes = stat.st_size
+                        modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).isoformat()
+                except OSError:
+                    resolved_path = str(path_candidate)
+            items.append(
+                {
+                    "name": entry.get("model_name") or entry.get("title") or name,
+                    "title": entry.get("title") or entry.get("model_name") or name,
+                    "hash": entry.get("hash"),
+                    "filename": filename,
+                    "path": resolved_path,
+                    "sizeBytes": size_bytes,
+                    "modified": modified,
+                }
+            )
+
+    for item in items:
+        item["isActive"] = bool(active and item.get("name") and active.startswith(item["name"]))
+
+    return {"count": len(items), "items": items, "active": active}
+
+
+def list_models(base_url: Optional[str] = None) -> Dict[str, Any]:
+    base = _base_url(base_url)
+    client = _http_client()
+    try:
+        response = client.get(f"{base}/sdapi/v1/sd-models", timeout=_timeout("models"))
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise _models_unavailable() from exc
+    raw_models = _raw_models(response)
+
+    active = None
+    try:
+        options_response = client.get(f"{base}/sdapi/v1/options", timeout=_timeout("models"))
+        options_response.raise_for_status()
+        active = _active_checkpoint(options_response)
+    except (httpx.HTTPError, json.JSONDecodeError):
         active = None
+
+    return _model_items(raw_models, active)
+
+
+async def list_models_async(base_url: Optional[str] = None) -> Dict[str, Any]:
+    base = _base_url(base_url)
+    client = _async_http_client()
+    models_request = client.get(f"{base}/sdapi/v1/sd-models", timeout=_timeout("models"))
+    options_request = client.get(f"{base}/sdapi/v1/options", timeout=_timeout("models"))
+    response, options_response = await asyncio.gather(models_request, options_request, return_exceptions=True)
+
+    if isinstance(response, BaseException):
+        if isinstance(response, httpx.HTTPError):
+            raise _models_unavailable() from response
+        raise response
+    try:
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise _models_unavailable() from exc
+    raw_models = _raw_models(response)
+
+    active = None
+    if not isinstance(options_response, BaseException):
         try:
-            options_response = client.get(f"{base}/sdapi/v1/options")
             options_response.raise_for_status()
-            options_payload = options_response.json()
-            if isinstance(options_payload, dict):
-                active = options_payload.get("sd_model_checkpoint")
+            active = _active_checkpoint(options_response)
         except (httpx.HTTPError, json.JSONDecodeError):
             active = None
 
-        for item in items:
-            item["isActive"] = bool(active and item.get("name") and active.startswith(item["name"]))
-
-        return {"count": len(items), "items": items, "active": active}
-
+    # Resolving checkpoint files touches the disk; keep it off the event loop.
+    return await asyncio.to_thread(_model_items, raw_models, active)
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import binascii
+import json
+import re
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Generator, List, Optional
+
+# Bytes that end a run of plain string content.
+_STRING_STOP = re.compile(rb'["\\]')
+# Bytes that matter while skipping over a nested object or array.
+_NESTED_STOP = re.compile(rb'["\[\]{}]')
+_LITERAL_END = re.compile(rb"[,\]}\s]")
+_WHITESPACE = b" \t\r\n"
+_ESCAPES = {b'"': b'"', b"\\": b"\\", b"/": b"/", b"b": b"\b", b"f": b"\f", b"n": b"\n", b"r": b"\r", b"t": b"\t"}
+# A data URL prefix ("data:image/png;base64,") is always shorter than this.
+_DATA_URL_LIMIT = 128
+
+_Need = Generator[None, bytes, Any]
+
+
+class StreamDecodeError(ValueError):
+    """The txt2img response was not the JSON document SD.Next should send."""
+
+
+class _Base64Sink:
+    """Decode base64 text written in arbitrary slices into ``target``, four characters at a time."""
+
+    def __init__(self, target: BinaryIO):
+        self._target = target
+        self._pending = b""
+        self._head: Optional[bytes] = b""
+
+    def write(self, data: bytes) -> None:
+        if self._head is not None:
+            data = self._strip_data_url(data)
+            if not data:
+                return
+        data = self._pending + data.translate(None, _WHITESPACE)
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        if usable:
+            self._decode(data[:usable])
+
+    def finish(self) -> None:
+        if self._head:
+            # Short payload that never reached the data-URL limit.
+            head, self._head = self._head, None
+            self.write(head)
+        if self._pending:
+            pending, self._pending = self._pending, b""
+            self._decode(pending + b"=" * (-len(pending) % 4))
+
+    def _strip_data_url(self, data: bytes) -> bytes:
+        head = self._head + data
+        if not head.startswith(b"data:"[: len(head)]):
+            self._head = None
+            return head
+        comma = head.find(b",")
+        if comma >= 0:
+            self._head = None
+            return head[comma + 1 :]
+        if len(head) > _DATA_URL_LIMIT:
+            raise StreamDecodeError("Malformed data URL in image payload")
+        self._head = head
+        return b""
+
+    def _decode(self, data: bytes) -> None:
+        try:
+            self._target.write(binascii.a2b_base64(data))
+        except binascii.Error as exc:
+            raise StreamDecodeError("Unable to decode image payload") from exc
+
+
+class Txt2ImgStream:
+    """Incremental parser for a ``/sdapi/v1/txt2img`` response body.
+
+    Feed raw body chunks; each entry of ``images`` is base64-decoded straight into the file
+    object returned by ``open_image(index)`` (``None`` skips it), ``info`` is kept for ``meta``
+    and every other key is skipped without buffering. Memory use is bounded by the chunk size
+    plus the size of ``info``.
+    """
+
+    def __init__(self, open_image: Callable[[int], Optional[BinaryIO]]):
+        self._open_image = open_image
+        self._buffer = b""
+        self._pos = 0
+        self._done = False
+        self.images = 0
+        self.info: Any = None
+        self._parser = self._document()
+        next(self._parser)
+
+    def feed(self, chunk: bytes) -> None:
+        if self._done or not chunk:
+            return
+        try:
+            self._parser.send(chunk)
+        except StopIteration:
+            self._done = True
+
+    def finish(self) -> None:
+        if not self._done:
+            raise StreamDecodeError("Truncated txt2img response")
+
+    # Grammar ---------------------------------------------------------------------
+    def _document(self) -> _Need:
+        yield from self._expect(b"{")
+        if (yield from self._peek()) == b"}":
+            self._pos += 1
+            return
+        while True:
+            key = yield from self._key()
+            if key == "images":
+                yield from self._images()
+            elif key == "info":
+                self.info = json.loads((yield from self._value(capture=True)).decode("utf-8"))
+            else:
+                yield from self._value(capture=False)
+            separator = yield from self._next()
+            if separator == b"}":
+                return
+            if separator != b",":
+                raise StreamDecodeError("Invalid JSON response from SD.Next")
+
+    def _key(self) -> _Need:
+        raw = yield from self._value(capture=True)
+        try:
+            key = json.loads(raw.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise StreamDecodeError("Invalid JSON response from SD.Next") from exc
+        if not isinstance(key, str):
+            raise StreamDecodeError("Invalid JSON response from SD.Next")
+        yield from self._expect(b":")
+        return key
+
+    def _images(self) -> _Need:
+        token = yield from self._peek()
+        if token != b"[":
+            yield from self._value(capture=False)
+            return
+        self._pos += 1
+        if (yield from self._peek()) == b"]":
+            self._pos += 1
+            return
+        while True:
+            if (yield from self._next()) != b'"':
+                raise StreamDecodeError("Invalid image payload from SD.Next")
+            target = self._open_image(self.images)
+            if target is None:
+                yield from self._string(None)
+            else:
+                sink = _Base64Sink(target)
+                yield from self._string(sink.write)
+                sink.finish()
+            self.images += 1
+            separator = yield from self._next()
+            if separator == b"]":
+                return
+            if separator != b",":
+                raise StreamDecodeError("Invalid JSON response from SD.Next")
+
+    def _value(self, capture: bool) -> _Need:
+        """Consume one JSON value; return its raw bytes when ``capture`` is set."""
+        parts: Optional[List[bytes]] = [] if capture else None
+        token = yield from self._peek()
+        if token == b'"':
+            self._pos += 1
+            yield from self._raw_string(parts)
+        elif token in (b"{", b"["):
+            yield from self._nested(parts)
+        else:
+            yield from self._literal(parts)
+        return b"".join(parts) if parts is not None else b""
+
+    # Scanning --------------------------------------------------------------------
+    def _string(self, write: Optional[Callable[[bytes], None]]) -> _Need:
+        """Stream the decoded content of a string whose opening quote was consumed."""
+        while True:
+            match = _STRING_STOP.search(self._buffer, self._pos)
+            end = match.start() if match else len(self._buffer)
+            if write is not None and end > self._pos:
+                write(self._buffer[self._pos : end])
+            self._pos = end
+            if match is None:
+                yield from self._more()
+                continue
+            self._pos += 1
+            if match.group() == b'"':
+                return
+            escape = yield from self._take(1)
+            if escape == b"u":
+                code = yield from self._take(4)
+                decoded = chr(int(code, 16)).encode("utf-8", "surrogatepass")
+            elif escape in _ESCAPES:
+                decoded = _ESCAPES[escape]
+            else:
+                raise StreamDecodeError("Invalid JSON escape in SD.Next response")
+            if write is not None:
+                write(decoded)
+
+    def _raw_string(self, parts: Optional[List[bytes]]) -> _Need:
+        """Copy a string (opening quote already consumed) verbatim, quotes included."""
+        if parts is not None:
+            parts.append(b'"')
+        while True:
+            match = _STRING_STOP.search(self._buffer, self._pos)
+            end = match.end() if match else len(self._buffer)
+            if parts is not None:
+                parts.append(self._buffer[self._pos : end])
+            self._pos = end
+            if match is None:
+                yield from self._more()
+            elif match.group() == b'"':
+                return
+            else:
+                escaped = yield from self._take(1)
+                if parts is not None:
+                    parts.append(escaped)
+
+    def _nested(self, parts: Optional[List[bytes]]) -> _Need:
+        depth = 0
+        while True:
+            match = _NESTED_STOP.search(self._buffer, self._pos)
+            end = match.end() if match else len(self._buffer)
+            token = match.group() if match else b""
+            if parts is not None:
+                # Strings re-add their own opening quote.
+                parts.append(self._buffer[self._pos : end - 1 if token == b'"' else end])
+            self._pos = end
+            if match is None:
+                yield from self._more()
+            elif token == b'"':
+                yield from self._raw_string(parts)
+            elif token in (b"{", b"["):
+                depth += 1
+            elif token in (b"}", b"]"):
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _literal(self, parts: Optional[List[bytes]]) -> _Need:
+        while True:
+            match = _LITERAL_END.search(self._buffer, self._pos)
+            end = match.start() if match else len(self._buffer)
+            if parts is not None:
+                parts.append(self._buffer[self._pos : end])
+            self._pos = end
+            if match is not None:
+                return
+            yield from self._more()
+
+    # Buffer management -----------------------------------------------------------
+    def _more(self) -> _Need:
+        chunk = b""
+        while not chunk:
+            chunk = yield
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+
+    def _peek(self) -> _Need:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos : self._pos + 1]
+            yield from self._more()
+
+    def _next(self) -> _Need:
+        token = yield from self._peek()
+        self._pos += 1
+        return token
+
+    def _expect(self, token: bytes) -> _Need:
+        if (yield from self._next()) != token:
+            raise StreamDecodeError("Invalid JSON response from SD.Next")
+
+    def _take(self, size: int) -> _Need:
+        while len(self._buffer) - self._pos < size:
+            yield from self._more()
+        data = self._buffer[self._pos : self._pos + size]
+        self._pos += size
+        return data
+
+
+class ImageFiles:
+    """Open destination files lazily for :class:`Txt2ImgStream`; extra images are skipped."""
+
+    def __init__(self, paths: List[Path]):
+        self._paths = paths
+        self._handles: List[BinaryIO] = []
+
+    def open(self, index: int) -> Optional[BinaryIO]:
+        if index >= len(self._paths):
+            return None
+        handle = self._paths[index].open("wb")
+        self._handles.append(handle)
+        return handle
+
+    def close(self) -> None:
+        for handle in self._handles:
+            handle.close()
+
+    def discard(self) -> None:
+        self.close()
+        for path in self._paths[: len(self._handles)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .config import bool_option, float_option, int_option, section
+
+
+@dataclass(frozen=True)
+class AdmissionConfig:
+    enabled: bool = True
+    # Queued (not yet running) jobs accepted in total and per client; 0 disables a limit.
+    max_queued: int = 1000
+    max_queued_per_client: int = 200
+    # Bounds for the Retry-After hint sent with a 429.
+    min_retry_after: float = 1.0
+    max_retry_after: float = 3600.0
+
+
+def load_admission_config() -> AdmissionConfig:
+    raw = section("admission")
+    defaults = AdmissionConfig()
+    min_retry = float_option(raw.get("min_retry_after_seconds"))
+    return AdmissionConfig(
+        enabled=bool_option(raw.get("enabled"), defaults.enabled),
+        max_queued=max(0, int_option(raw.get("max_queued"), defaults.max_queued)),
+        max_queued_per_client=max(0, int_option(raw.get("max_queued_per_client"), defaults.max_queued_per_client)),
+        min_retry_after=max(1.0, min_retry) if min_retry is not None else defaults.min_retry_after,
+        max_retry_after=float_option(raw.get("max_retry_after_seconds")) or defaults.max_retry_after,
+    )
+
+
+def check_admission(config: AdmissionConfig, queued: int, client_queued: int) -> Optional[Tuple[str, int]]:
+    """Which limit a new job would exceed, with how many queued jobs must start first."""
+    if not config.enabled:
+        return None
+    if config.max_queued_per_client and client_queued >= config.max_queued_per_client:
+        return "client", client_queued - config.max_queued_per_client + 1
+    if config.max_queued and queued >= config.max_queued:
+        return "queue", queued - config.max_queued + 1
+    return None
+
+
+def retry_after(config: AdmissionConfig, seconds: float) -> int:
+    return math.ceil(min(config.max_retry_after, max(config.min_retry_after, seconds)))
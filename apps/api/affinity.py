@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from .adapters.sdnext import model_matches
+from .config import bool_option, float_option, int_option, section
+
+
+@dataclass(frozen=True)
+class AffinityConfig:
+    enabled: bool = True
+    # How far down the dispatch order to look for a job on the loaded checkpoint.
+    lookahead: int = 32
+    # A job that has been passed over this many times, or has waited this long, goes next.
+    max_skips: int = 4
+    max_wait: float = 120.0
+
+
+def load_affinity_config() -> AffinityConfig:
+    raw = section("affinity")
+    defaults = AffinityConfig()
+    return AffinityConfig(
+        enabled=bool_option(raw.get("enabled"), defaults.enabled),
+        lookahead=max(1, int_option(raw.get("lookahead"), defaults.lookahead)),
+        max_skips=max(0, int_option(raw.get("max_skips"), defaults.max_skips)),
+        max_wait=float_option(raw.get("max_wait_seconds")) or defaults.max_wait,
+    )
+
+
+class AffinityPolicy:
+    """Prefer queued jobs for the checkpoint a backend already has loaded.
+
+    ``choose`` gets the scheduler's dispatch order and returns the first job that either
+    runs on the loaded checkpoint (no model swap) or has hit the starvation bound; jobs it
+    passes over are counted so none of them can be bypassed indefinitely.
+    """
+
+    def __init__(self, config: AffinityConfig):
+        self._config = config
+        self._skips: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._in_order = 0
+        self._forced = 0
+        self._mismatched = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.enabled
+
+    @property
+    def lookahead(self) -> int:
+        return self._config.lookahead
+
+    def choose(
+        self,
+        ordered: List[str],
+        loaded: Optional[str],
+        model_of: Callable[[str], Optional[str]],
+        waited: Callable[[str], float],
+    ) -> Optional[str]:
+        if not ordered or loaded is None:
+            return None
+        with self._lock:
+            for index, job_id in enumerate(ordered):
+                if model_matches(loaded, model_of(job_id)):
+                    if index:
+                        self._hits += 1
+                        for skipped in ordered[:index]:
+                            self._skips[skipped] = self._skips.get(skipped, 0) + 1
+                    else:
+                        self._in_order += 1
+                    return job_id
+                if self._skips.get(job_id, 0) >= self._config.max_skips or waited(job_id) >= self._config.max_wait:
+                    self._forced += 1
+                    return job_id
+            # Nothing in the window uses the loaded checkpoint; a swap is unavoidable.
+            self._mismatched += 1
+            return ordered[0]
+
+    def forget(self, job_id: str) -> None:
+        with self._lock:
+            self._skips.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self._config.enabled,
+                "affinityHits": self._hits,
+                "inOrder": self._in_order,
+                "forced": self._forced,
+                "unavoidableSwaps": self._mismatched,
+                "skipped": len(self._skips),
+            }
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from .adapters import sdnext
+
+
+@dataclass
+class Backend:
+    name: str
+    base_url: str
+    workers: int = 1
+    in_flight: int = 0
+    healthy: bool = True
+    last_error: Optional[str] = None
+    checked_at: Optional[float] = None
+    completed: int = 0
+    failed: int = 0
+    # Checkpoint SD.Next reports as loaded (None until first checked) and swap accounting.
+    loaded_model: Optional[str] = None
+    model_checked_at: Optional[float] = None
+    swaps: int = 0
+    swap_seconds: float = 0.0
+    # Batches actually executing (slots also cover the dispatcher waiting for work) and warm-up state.
+    running: int = 0
+    warming: bool = False
+    idle_since: float = field(default_factory=time.monotonic)
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / max(1, self.workers)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "baseUrl": self.base_url,
+            "workers": self.workers,
+            "inFlight": self.in_flight,
+            "healthy": self.healthy,
+            "lastError": self.last_error,
+            "completed": self.completed,
+            "failed": self.failed,
+            "loadedModel": self.loaded_model,
+            "swaps": self.swaps,
+            "swapSeconds": round(self.swap_seconds, 3),
+            "running": self.running,
+            "warming": self.warming,
+        }
+
+
+def is_unreachable(exc: BaseException) -> bool:
+    """True when an adapter error was caused by the backend being unreachable."""
+    cause = exc.__cause__ if isinstance(exc, HTTPException) else exc
+    return isinstance(cause, httpx.TransportError)
+
+
+class BackendPool:
+    """Tracks SD.Next endpoints and hands out worker slots on the least-loaded healthy one."""
+
+    def __init__(self, configs: List[Dict[str, Any]], health_interval: float):
+        self._backends = [
+            Backend(name=item["name"], base_url=item["base_url"], workers=item["workers"]) for item in configs
+        ]
+        self._health_interval = health_interval
+        self._cond = threading.Condition()
+        # Runs even for a single backend so one marked unhealthy is noticed when it comes back.
+        self._health_thread = threading.Thread(target=self._health_loop, name="codex-backend-health", daemon=True)
+        self._health_thread.start()
+
+    @property
+    def backends(self) -> List[Backend]:
+        return list(self._backends)
+
+    def get(self, name: Optional[str]) -> Optional[Backend]:
+        for backend in self._backends:
+            if backend.name == name:
+                return backend
+        return None
+
+    def status(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [backend.to_dict() for backend in self._backends]
+
+    # Slot accounting -------------------------------------------------------------
+    def acquire(self) -> Backend:
+        """Block until a worker slot is free and reserve it on the least-loaded backend."""
+        with self._cond:
+            while True:
+                backend = self._pick(require_slot=True)
+                if backend:
+                    backend.in_flight += 1
+                    return backend
+                self._cond.wait()
+
+    def claim(self) -> Backend:
+        """Reserve the least-loaded backend without waiting for a free worker slot."""
+        with self._cond:
+            backend = self._pick(require_slot=False)
+            assert backend is not None
+            backend.in_flight += 1
+            return backend
+
+    def release(self, backend: Backend, ok: bool = True) -> None:
+        with self._cond:
+            backend.in_flight = max(0, backend.in_flight - 1)
+            if ok:
+                backend.completed += 1
+                # A request just succeeded, so the backend is reachable again.
+                backend.healthy = True
+                backend.last_error = None
+            else:
+                backend.failed += 1
+            self._cond.notify_all()
+
+    def _pick(self, require_slot: bool) -> Optional[Backend]:
+        candidates = [backend for backend in self._backends if backend.healthy]
+        if not candidates:
+            # Nothing looks healthy; keep dispatching so jobs fail visibly instead of hanging.
+            candidates = list(self._backends)
+        if require_slot:
+            candidates = [backend for backend in candidates if backend.in_flight < backend.workers]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda backend: (backend.load, backend.in_flight))
+
+    # Work vs. warm-up -------------------------------------------------------------
+    def begin_work(self, backend: Backend) -> None:
+        """Mark a batch as executing, waiting for an in-progress warm-up to finish first."""
+        with self._cond:
+            while backend.warming:
+                self._cond.wait()
+            backend.running += 1
+
+    def end_work(self, backend: Backend) -> None:
+        with self._cond:
+            backend.running = max(0, backend.running - 1)
+            if not backend.running:
+                backend.idle_since = time.monotonic()
+            self._cond.notify_all()
+
+    def try_begin_warm(self, backend: Backend, idle_for: float = 0.0) -> bool:
+        """Take a backend for model loading if nothing has run on it for ``idle_for`` seconds.
+
+        Health is not required: the warmer backs off on its own while a backend is unreachable.
+        """
+        with self._cond:
+            if backend.warming or backend.running:
+                return False
+            if time.monotonic() - backend.idle_since < idle_for:
+                return False
+            backend.warming = True
+            return True
+
+    def end_warm(self, backend: Backend) -> None:
+        with self._cond:
+            backend.warming = False
+            backend.idle_since = time.monotonic()
+            self._cond.notify_all()
+
+    # Loaded checkpoint --------------------------------------------------------------
+    def set_loaded_model(self, backend: Backend, model: Optional[str]) -> None:
+        with self._cond:
+            backend.loaded_model = model
+            backend.model_checked_at = time.monotonic()
+
+    def record_swap(self, backend: Backend, model: str, seconds: float) -> None:
+        with self._cond:
+            backend.loaded_model = model
+            backend.model_checked_at = time.monotonic()
+            backend.swaps += 1
+            backend.swap_seconds += seconds
+
+    # Health ----------------------------------------------------------------------
+    def mark_unhealthy(self, backend: Backend, error: str) -> None:
+        with self._cond:
+            backend.healthy = False
+            backend.last_error = error
+            backend.checked_at = time.monotonic()
+            self._cond.notify_all()
+
+    def mark_healthy(self, backend: Backend) -> None:
+        with self._cond:
+            backend.healthy = True
+            backend.last_error = None
+            backend.checked_at = time.monotonic()
+            self._cond.notify_all()
+
+    def _health_loop(self) -> None:
+        while True:
+            for backend in self._backends:
+                try:
+                    sdnext.health(backend.base_url)
+                except Exception as exc:
+                    self.mark_unhealthy(backend, str(getattr(exc, "detail", exc)))
+                else:
+                    self.mark_healthy(backend)
+            time.sleep(self._health_interval)
@@ -1,15 +1,31 @@
 ﻿from __future__ import annotations
 
+import hashlib
 import json
+import logging
+import os
 import platform
+import site
+import subprocess
 import sys
+import threading
+import time
 from importlib import import_module
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import bool_option, float_option, section
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 MATRIX_PATH = PROJECT_ROOT / "build" / "compat_matrix.json"
 REPORT_PATH = PROJECT_ROOT / "build" / "compat_report.md"
+CACHE_PATH = PROJECT_ROOT / "build" / "capabilities.cache.json"
+DEFAULT_PROBE_TIMEOUT = 120.0
+
+# Modules imported by the probe subprocess; the API process never imports them itself.
+PROBED_MODULES = ("torch", "torchao", "bitsandbytes", "optimum", "optimum.quanto", "sdnq", "sageattention")
+
+logger = logging.getLogger(__name__)
 
 
 def _normalize_cuda(tag: Optional[str]) -> Optional[str]:
@@ -54,18 +70,87 @@ def _collect_notes(packages: Dict[str, Any]) -> Dict[str, str]:
     return notes
 
 
-def get_capabilities() -> Dict[str, Any]:
-    matrix = {}
-    packages: Dict[str, Any] = {}
-    notes: Dict[str, str] = {}
+def probe_imports() -> Dict[str, Dict[str, Any]]:
+    """Import each probed module; runs inside the probe subprocess."""
+    results: Dict[str, Dict[str, Any]] = {}
+    for name in PROBED_MODULES:
+        if name == "optimum.quanto" and not results.get("optimum", {}).get("ok"):
+            results[name] = {"ok": False, "error": results.get("optimum", {}).get("error")}
+            continue
+        module, error = _import_optional(name)
+        result: Dict[str, Any] = {"ok": module is not None, "error": error}
+        if module is not None:
+            result["version"] = getattr(module, "__version__", None)
+            if name == "torch":
+                result["compile"] = bool(getattr(module, "compile", None))
+        results[name] = result
+    return results
+
+
+def _site_dirs() -> List[str]:
+    dirs = list(getattr(site, "getsitepackages", lambda: [])())
+    user_site = getattr(site, "getusersitepackages", lambda: None)()
+    if isinstance(user_site, str):
+        dirs.append(user_site)
+    dirs.extend(path for path in sys.path if path.endswith(("site-packages", "dist-packages")))
+    return sorted(set(dirs))
 
-    if MATRIX_PATH.exists():
+
+def environment_fingerprint() -> str:
+    """Hash of the interpreter and the installed-package directories.
+
+    Installing or removing a distribution touches its site-packages directory, which changes
+    the directory mtime and therefore the fingerprint.
+    """
+    parts: List[str] = [sys.executable, sys.version]
+    for path in _site_dirs():
         try:
-            matrix = json.loads(MATRIX_PATH.read_text(encoding="utf-8"))
-            packages = matrix.get("packages", {})
-            notes.update(_collect_notes(packages))
-        except json.JSONDecodeError:
-            matrix = {}
+            parts.append(f"{path}:{os.stat(path).st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path}:missing")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _run_probe(timeout: float) -> Tuple[Dict[str, Dict[str, Any]], Optional[str]]:
+    """Run :func:`probe_imports` in a short-lived interpreter; return ``(results, error)``."""
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-m", "apps.api.capabilities", "--probe"],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            cwd=str(PROJECT_ROOT),
+        )
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        return {}, f"Capability probe failed: {exc}"
+    if completed.returncode != 0:
+        detail = (completed.stderr or "").strip().splitlines()[-1:] or ["no output"]
+        return {}, f"Capability probe exited with {completed.returncode}: {detail[0]}"
+    try:
+        lines = completed.stdout.strip().splitlines()
+        results = json.loads(lines[-1]) if lines else None
+    except json.JSONDecodeError:
+        results = None
+    if not isinstance(results, dict):
+        return {}, "Capability probe returned no result"
+    return results, None
+
+
+def _read_matrix() -> Dict[str, Any]:
+    if not MATRIX_PATH.exists():
+        return {}
+    try:
+        matrix = json.loads(MATRIX_PATH.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return matrix if isinstance(matrix, dict) else {}
+
+
+def _build(
+    imports: Dict[str, Dict[str, Any]], probe_error: Optional[str], matrix: Dict[str, Any]
+) -> Dict[str, Any]:
+    packages: Dict[str, Any] = matrix.get("packages", {})
+    notes: Dict[str, str] = _collect_notes(packages)
 
     env_meta = matrix.get("environment", {}) if isinstance(matrix, dict) else {}
 
@@ -78,15 +163,18 @@ def get_capabilities() -> Dict[str, Any]:
             "platform", platform.machine().lower() or sys.platform
         ),
     }
+    if probe_error:
+        notes["probe"] = probe_error
+
+    def module(name: str) -> Dict[str, Any]:
+        result = imports.get(name) or {}
+        if not result.get("ok") and result.get("error"):
+            notes.setdefault(name.replace(".", "_"), result["error"])
+        return result
 
-    torch_module, torch_err = _import_optional("torch")
-    torch_version = None
-    torch_compile = False
-    if torch_module:
-        torch_version = getattr(torch_module, "__version__", None)
-        torch_compile = bool(getattr(torch_module, "compile", None))
-    elif torch_err:
-        notes.setdefault("torch", torch_err)
+    torch_info = module("torch")
+    torch_version = torch_info.get("version")
+    torch_compile = bool(torch_info.get("compile"))
 
     if not torch_version and packages.get("torch"):
         torch_version = packages["torch"].get("required_version")
@@ -100,52 +188,18 @@ def get_capabilities() -> Dict[str, Any]:
     }
 
     quantize = {
-        "torchao": False,
-        "bitsandbytes": "unavailable",
-        "optimum_quanto": False,
-        "sdnq": False,
-    }
-
-    torchao_mod, torchao_err = _import_optional("torchao")
-    if torchao_mod:
-        quantize["torchao"] = True
-    elif torchao_err:
-        notes.setdefault("torchao", torchao_err)
-
-    bnb_mod, bnb_err = _import_optional("bitsandbytes")
-    if bnb_mod:
+        "torchao": bool(module("torchao").get("ok")),
         # Windows CUDA builds are generally unavailable; treat as CPU fallback if module imports.
-        quantize["bitsandbytes"] = "cpu"
-    elif bnb_err:
-        notes.setdefault("bitsandbytes", bnb_err)
-
-    optimum_mod, optimum_err = _import_optional("optimum")
-    quanto_mod = None
-    quanto_err = None
-    if optimum_mod:
-        quanto_mod, quanto_err = _import_optional("optimum.quanto")
-    else:
-        quanto_err = optimum_err
-
-    if quanto_mod:
-        quantize["optimum_quanto"] = True
-    elif quanto_err:
-        notes.setdefault("optimum_quanto", quanto_err)
-
-    sdnq_mod, sdnq_err = _import_optional("sdnq")
-    if sdnq_mod:
-        quantize["sdnq"] = True
-    elif sdnq_err:
-        notes.setdefault("sdnq", sdnq_err)
+        "bitsandbytes": "cpu" if module("bitsandbytes").get("ok") else "unavailable",
+        "optimum_quanto": bool(module("optimum.quanto").get("ok")),
+        "sdnq": bool(module("sdnq").get("ok")),
+    }
 
-    sage_mod, sage_err = _import_optional("sageattention")
     extras = {
-        "sage_attention": bool(sage_mod),
+        "sage_attention": bool(module("sageattention").get("ok")),
         "gguf": False,
         "chroma": True,
     }
-    if not sage_mod and sage_err:
-        notes.setdefault("sageattention", sage_err)
 
     capabilities = {
         "env": env,
@@ -160,3 +214,100 @@ def get_capabilities() -> Dict[str, Any]:
     }
 
     return capabilities
+
+
+class CapabilityCache:
+    """Probe results held in memory and on disk, keyed by :func:`environment_fingerprint`."""
+
+    def __init__(self, path: Path = CACHE_PATH, timeout: Optional[float] = None):
+        self._path = path
+        self._timeout = timeout or float_option(section("capabilities").get("probe_timeout")) or DEFAULT_PROBE_TIMEOUT
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[str] = None
+        self._imports: Optional[Dict[str, Dict[str, Any]]] = None
+        self._probe: Dict[str, Any] = {}
+        self._error: Optional[str] = None
+        # Built once per probe (with compat_matrix.json parsed alongside it) and served as-is.
+        self._capabilities: Optional[Dict[str, Any]] = None
+
+    def get(self, refresh: bool = False) -> Dict[str, Any]:
+        # One caller probes at a time; concurrent callers wait and reuse its result.
+        with self._lock:
+            fingerprint = environment_fingerprint()
+            if refresh or self._imports is None or fingerprint != self._fingerprint:
+                self._load(fingerprint, refresh)
+            if self._capabilities is None:
+                self._capabilities = _build(self._imports or {}, self._error, _read_matrix())
+            return {**self._capabilities, "probe": dict(self._probe)}
+
+    def warm(self) -> threading.Thread:
+        """Probe in the background so the first request is served from memory."""
+        thread = threading.Thread(target=self.get, name="codex-capabilities", daemon=True)
+        thread.start()
+        return thread
+
+    def _load(self, fingerprint: str, refresh: bool) -> None:
+        cached = None if refresh else self._read_disk()
+        if cached and cached.get("fingerprint") == fingerprint and isinstance(cached.get("imports"), dict):
+            self._store(fingerprint, cached["imports"], None, cached.get("probedAt"), "disk")
+            return
+        started = time.monotonic()
+        imports, error = _run_probe(self._timeout)
+        self._store(fingerprint, imports, error, time.time(), "subprocess")
+        self._probe["durationMs"] = int((time.monotonic() - started) * 1000)
+        if error is None:
+            self._write_disk({"fingerprint": fingerprint, "probedAt": self._probe["probedAt"], "imports": imports})
+        else:
+            logger.warning("%s", error)
+
+    def _store(
+        self,
+        fingerprint: str,
+        imports: Dict[str, Dict[str, Any]],
+        error: Optional[str],
+        probed_at: Optional[float],
+        source: str,
+    ) -> None:
+        self._fingerprint = fingerprint
+        self._imports = imports
+        self._error = error
+        self._probe = {"fingerprint": fingerprint, "probedAt": probed_at, "source": source}
+        self._capabilities = None
+
+    def _read_disk(self) -> Optional[Dict[str, Any]]:
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _write_disk(self, data: Dict[str, Any]) -> None:
+        temp = self._path.with_suffix(".tmp")
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            temp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+            os.replace(temp, self._path)
+        except OSError:
+            logger.exception("Failed to write %s", self._path)
+
+
+capability_cache = CapabilityCache()
+
+
+def probe_on_startup() -> bool:
+    return bool_option(section("capabilities").get("probe_on_startup"), True)
+
+
+def get_capabilities() -> Dict[str, Any]:
+    return capability_cache.get()
+
+
+def refresh_capabilities() -> Dict[str, Any]:
+    return capability_cache.get(refresh=True)
+
+
+if __name__ == "__main__":
+    if "--probe" in sys.argv[1:]:
+        print(json.dumps(probe_imports(), default=str))
+    else:
+        print(json.dumps(get_capabilities(), indent=2, default=str))
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from .config import bool_option, float_option, int_option, section
+
+RANDOM_SEEDS = (None, -1)
+
+
+@dataclass(frozen=True)
+class CoalesceConfig:
+    enabled: bool = True
+    window: float = 0.05
+    max_batch: int = 4
+    scan_limit: int = 64
+
+
+def load_coalesce_config() -> CoalesceConfig:
+    raw = section("coalesce")
+    defaults = CoalesceConfig()
+    window_ms = float_option(raw.get("window_ms"))
+    return CoalesceConfig(
+        enabled=bool_option(raw.get("enabled"), defaults.enabled),
+        window=max(0.0, window_ms / 1000.0) if window_ms is not None else defaults.window,
+        max_batch=max(1, int_option(raw.get("max_batch"), defaults.max_batch)),
+        scan_limit=max(0, int_option(raw.get("scan_limit"), defaults.scan_limit)),
+    )
+
+
+def batch_key(payload: Dict[str, Any]) -> str:
+    """Everything except the seed must match for two jobs to share a backend batch."""
+    shared = {key: value for key, value in payload.items() if key != "seed"}
+    return json.dumps(shared, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def can_join(batch: List[Dict[str, Any]], candidate: Dict[str, Any]) -> bool:
+    """SD.Next seeds a batch as ``seed, seed + 1, ...``; only accept jobs that reproduce exactly."""
+    first = batch[0]
+    if batch_key(first) != batch_key(candidate):
+        return False
+    first_seed = first.get("seed")
+    seed = candidate.get("seed")
+    if first_seed in RANDOM_SEEDS:
+        return seed in RANDOM_SEEDS
+    return seed == first_seed + len(batch)
+
+
+def batch_params(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+    params = dict(batch[0])
+    if params.get("seed") in RANDOM_SEEDS:
+        params.pop("seed", None)
+    return params
+
+
+
+def split_runs(batch: List[Dict[str, Any]]) -> List[List[int]]:
+    """Regroup a batch that lost members into runs that still seed as ``seed, seed + 1, ...``."""
+    runs: List[List[int]] = []
+    for index, payload in enumerate(batch):
+        if runs and can_join([batch[member] for member in runs[-1]], payload):
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+    return runs
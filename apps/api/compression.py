@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import bool_option, int_option, section
+
+try:  # Optional: brotli is preferred when installed, gzip is always available.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Only text-like bodies are worth compressing; images are already compressed and SSE must not buffer.
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "image/svg+xml", "text/")
+EXCLUDED_TYPES = ("text/event-stream",)
+# Bodies at least this large are compressed off the event loop.
+_THREAD_THRESHOLD = 256 * 1024
+
+
+@dataclass(frozen=True)
+class CompressionConfig:
+    enabled: bool = True
+    minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+
+
+def load_compression_config() -> CompressionConfig:
+    raw = section("compression")
+    defaults = CompressionConfig()
+    return CompressionConfig(
+        enabled=bool_option(raw.get("enabled"), defaults.enabled),
+        minimum_size=max(0, int_option(raw.get("minimum_size"), defaults.minimum_size)),
+        gzip_level=min(9, max(1, int_option(raw.get("gzip_level"), defaults.gzip_level))),
+        brotli_quality=min(11, max(0, int_option(raw.get("brotli_quality"), defaults.brotli_quality))),
+    )
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick ``br`` or ``gzip`` from an ``Accept-Encoding`` header, honouring ``q=0``."""
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name.strip()] = weight
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    ranked = [(weights.get(name, wildcard), -index, name) for index, name in enumerate(candidates)]
+    weight, _, name = max(ranked)
+    return name if weight > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, config: CompressionConfig):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=config.brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(config.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+    def whole(self, data: bytes) -> bytes:
+        return self.compress(data) + self.finish()
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").lower()
+    if content_type.startswith(EXCLUDED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Negotiate brotli or gzip for text responses of at least ``minimum_size`` bytes.
+
+    Responses that already carry a ``Content-Encoding``, partial (206) responses, images
+    and event streams pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, config: Optional[CompressionConfig] = None):
+        self.app = app
+        self.config = config or CompressionConfig()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.config.enabled:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        await self.app(scope, receive, _Responder(send, encoding, self.config).send)
+
+
+class _Responder:
+    def __init__(self, send: Send, encoding: Optional[str], config: CompressionConfig):
+        self._send = send
+        self._encoding = encoding
+        self._config = config
+        self._start: Optional[Message] = None
+        self._passthrough = False
+        self._compressor: Optional[_Compressor] = None
+
+    async def send(self, message: Message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self._start = message
+            self._passthrough = (
+                message["status"] in (204, 206, 304)
+                or "content-encoding" in headers
+                or not _compressible(headers)
+            )
+            if self._passthrough:
+                await self._send(message)
+            return
+        if kind != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._compressor is not None:
+            # Streaming response that is already being compressed.
+            data = self._compressor.compress(body)
+            if not more_body:
+                data += self._compressor.finish()
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        start, self._start = self._start, None
+        headers = MutableHeaders(raw=start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if self._encoding is None or (not more_body and len(body) < self._config.minimum_size):
+            self._passthrough = True
+            await self._send(start)
+            await self._send(message)
+            return
+
+        compressor = _Compressor(self._encoding, self._config)
+        headers["Content-Encoding"] = self._encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # The compressed bytes differ, so a strong validator must not be reused as-is.
+            headers["ETag"] = f"W/{etag}"
+        if more_body:
+            del headers["Content-Length"]
+            self._compressor = compressor
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": compressor.compress(body), "more_body": True})
+            return
+        if len(body) >= _THREAD_THRESHOLD:
+            data = await run_in_threadpool(compressor.whole, body)
+        else:
+            data = compressor.whole(body)
+        headers["Content-Length"] = str(len(data))
+        await self._send(start)
+        await self._send({"type": "http.response.body", "body": data})
+
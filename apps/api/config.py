@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CONFIG_PATH = Path(__file__).resolve().parent / "config.json"
+
+
+def _load_config() -> Dict[str, Any]:
+    try:
+        raw = CONFIG_PATH.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return {}
+
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError as exc:
+        raise RuntimeError(f"Invalid JSON in {CONFIG_PATH}: {exc}") from exc
+
+    if not isinstance(data, dict):
+        raise RuntimeError(f"Config at {CONFIG_PATH} must be a JSON object")
+
+    return data
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Dict[str, Any]:
+    return _load_config()
+
+
+def section(name: str) -> Dict[str, Any]:
+    value = get_config().get(name)
+    return value if isinstance(value, dict) else {}
+
+
+def float_option(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def int_option(value: Any, fallback: int) -> int:
+    try:
+        return int(value) if value is not None else fallback
+    except (TypeError, ValueError):
+        return fallback
+
+
+def bool_option(value: Any, fallback: bool) -> bool:
+    return value if isinstance(value, bool) else fallback
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+
+from .adapters import sdnext
+from .config import float_option, int_option, section
+
+
+@dataclass(frozen=True)
+class EtaConfig:
+    # Prior used until a model (or any model) has finished a job.
+    default_seconds_per_unit: float = 0.15
+    # Weight of the newest observation in the moving average.
+    smoothing: float = 0.2
+    # Stand-ins for request fields that fall back to SD.Next's own defaults.
+    default_steps: int = 20
+    default_width: int = 512
+    default_height: int = 512
+    # Finished jobs replayed from the journal on startup so learned rates survive restarts.
+    history_jobs: int = 200
+
+
+def load_eta_config() -> EtaConfig:
+    raw = section("eta")
+    defaults = EtaConfig()
+    smoothing = float_option(raw.get("smoothing"))
+    return EtaConfig(
+        default_seconds_per_unit=float_option(raw.get("default_seconds_per_unit"))
+        or defaults.default_seconds_per_unit,
+        smoothing=min(1.0, max(0.01, smoothing)) if smoothing else defaults.smoothing,
+        default_steps=max(1, int_option(raw.get("default_steps"), defaults.default_steps)),
+        default_width=max(64, int_option(raw.get("default_width"), defaults.default_width)),
+        default_height=max(64, int_option(raw.get("default_height"), defaults.default_height)),
+        history_jobs=max(0, int_option(raw.get("history_jobs"), defaults.history_jobs)),
+    )
+
+
+def _key(model: Optional[str]) -> str:
+    return sdnext.checkpoint_name(model) if model else ""
+
+
+class EtaEstimator:
+    """Learns generation cost as seconds per (steps x megapixels), per model.
+
+    Each finished batch updates an exponential moving average for its model and for all
+    models together; estimates fall back from the model's rate to the global rate to the
+    configured prior. Models are keyed by checkpoint name, so a request's ``model`` and the
+    title SD.Next reports for a loaded checkpoint share one rate.
+    """
+
+    def __init__(self, config: EtaConfig):
+        self._config = config
+        self._rates: Dict[str, float] = {}
+        self._samples: Dict[str, int] = {}
+        self._global: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def units(self, payload: Optional[Mapping[str, Any]]) -> float:
+        payload = payload or {}
+        config = self._config
+        steps = int_option(payload.get("steps"), config.default_steps) or config.default_steps
+        width = int_option(payload.get("width"), config.default_width) or config.default_width
+        height = int_option(payload.get("height"), config.default_height) or config.default_height
+        return steps * width * height / 1_000_000
+
+    @property
+    def history_jobs(self) -> int:
+        return self._config.history_jobs
+
+    def rate(self, model: Optional[str]) -> float:
+        with self._lock:
+            rate = self._rates.get(_key(model))
+            if rate is None:
+                rate = self._global
+        return rate if rate is not None else self._config.default_seconds_per_unit
+
+    def estimate(self, model: Optional[str], payload: Optional[Mapping[str, Any]]) -> float:
+        """Expected seconds to generate ``payload`` on ``model``."""
+        return self.rate(model) * self.units(payload)
+
+    def observe(self, model: Optional[str], units: float, seconds: float) -> None:
+        if units <= 0 or seconds <= 0:
+            return
+        sample = seconds / units
+        alpha = self._config.smoothing
+        key = _key(model)
+        with self._lock:
+            previous = self._rates.get(key)
+            self._rates[key] = sample if previous is None else previous + alpha * (sample - previous)
+            self._samples[key] = self._samples.get(key, 0) + 1
+            self._global = sample if self._global is None else self._global + alpha * (sample - self._global)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "secondsPerUnit": round(self._global, 4) if self._global is not None else None,
+                "models": {
+                    model or "(default)": {"secondsPerUnit": round(rate, 4), "samples": self._samples[model]}
+                    for model, rate in self._rates.items()
+                },
+                "defaultSecondsPerUnit": self._config.default_seconds_per_unit,
+            }
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from .json_response import dumps
+
+TERMINAL_STATUSES = ("done", "error", "expired")
+
+
+@dataclass
+class _Subscriber:
+    loop: asyncio.AbstractEventLoop
+    queue: "asyncio.Queue[Dict[str, Any]]"
+    job_id: Optional[str]
+
+
+def _offer(queue: "asyncio.Queue[Dict[str, Any]]", event: Dict[str, Any]) -> None:
+    # Slow consumers only need the latest state; drop the oldest update instead of blocking publishers.
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(event)
+
+
+class EventBroker:
+    """Fans job updates out from worker threads to asyncio subscribers."""
+
+    def __init__(self, max_pending: int = 256):
+        self._max_pending = max_pending
+        self._subscribers: List[_Subscriber] = []
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        job_id = event.get("id")
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber.job_id is not None and subscriber.job_id != job_id:
+                continue
+            try:
+                subscriber.loop.call_soon_threadsafe(_offer, subscriber.queue, event)
+            except RuntimeError:
+                # Event loop already closed; the subscription is stale.
+                self._remove(subscriber)
+
+    @contextmanager
+    def subscribe(self, job_id: Optional[str] = None) -> Iterator["asyncio.Queue[Dict[str, Any]]"]:
+        subscriber = _Subscriber(
+            loop=asyncio.get_running_loop(),
+            queue=asyncio.Queue(maxsize=self._max_pending),
+            job_id=job_id,
+        )
+        with self._lock:
+            self._subscribers.append(subscriber)
+        try:
+            yield subscriber.queue
+        finally:
+            self._remove(subscriber)
+
+    def _remove(self, subscriber: _Subscriber) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+
+def format_sse(event: Dict[str, Any], name: str = "job") -> str:
+    return f"event: {name}\ndata: {dumps(event).decode('utf-8')}\n\n"
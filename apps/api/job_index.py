@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .queue import JobRecord
+
+
+class JobIndex:
+    """Creation-ordered job map with per-status and per-model secondary indexes.
+
+    Every job gets a monotonically increasing ``seq``; indexes are sorted ``seq`` lists so
+    newest-first pages are a bisect plus a short backwards walk. Not thread-safe: callers
+    hold the queue lock.
+    """
+
+    def __init__(self) -> None:
+        self._by_id: Dict[str, "JobRecord"] = {}
+        self._by_seq: Dict[int, "JobRecord"] = {}
+        self._order: List[int] = []
+        self._status: Dict[str, List[int]] = {}
+        self._model: Dict[Optional[str], List[int]] = {}
+        self._indexed_status: Dict[int, str] = {}
+        self._next_seq = 1
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._by_id
+
+    def get(self, job_id: str) -> Optional["JobRecord"]:
+        return self._by_id.get(job_id)
+
+    def values(self) -> Iterable["JobRecord"]:
+        return self._by_id.values()
+
+    # Mutation --------------------------------------------------------------------
+    def add(self, job: "JobRecord") -> None:
+        job.seq = self._next_seq
+        self._next_seq += 1
+        self._by_id[job.id] = job
+        self._by_seq[job.seq] = job
+        self._order.append(job.seq)
+        self._status.setdefault(job.status, []).append(job.seq)
+        self._model.setdefault(job.model, []).append(job.seq)
+        self._indexed_status[job.seq] = job.status
+
+    def update(self, job: "JobRecord") -> None:
+        """Move ``job`` to the index of its current status."""
+        previous = self._indexed_status.get(job.seq)
+        if previous is None or previous == job.status:
+            return
+        seqs = self._status.get(previous, [])
+        position = bisect_left(seqs, job.seq)
+        if position < len(seqs) and seqs[position] == job.seq:
+            del seqs[position]
+        insort(self._status.setdefault(job.status, []), job.seq)
+        self._indexed_status[job.seq] = job.status
+
+    def remove(self, job_ids: Iterable[str]) -> None:
+        removed = False
+        for job_id in job_ids:
+            job = self._by_id.pop(job_id, None)
+            if job is None:
+                continue
+            self._by_seq.pop(job.seq, None)
+            self._indexed_status.pop(job.seq, None)
+            removed = True
+        if removed:
+            live = self._by_seq
+            self._order = [seq for seq in self._order if seq in live]
+            self._status = {key: [seq for seq in seqs if seq in live] for key, seqs in self._status.items()}
+            self._model = {key: [seq for seq in seqs if seq in live] for key, seqs in self._model.items()}
+
+    # Queries ---------------------------------------------------------------------
+    def with_status(self, statuses: Sequence[str]) -> List["JobRecord"]:
+        """Jobs currently in any of ``statuses``, oldest first."""
+        seqs = sorted(seq for status in statuses for seq in self._status.get(status, []))
+        jobs = (self._by_seq.get(seq) for seq in seqs)
+        return [job for job in jobs if job is not None and job.status in statuses]
+
+    def page(
+        self,
+        limit: int,
+        cursor: Optional[int] = None,
+        statuses: Optional[Sequence[str]] = None,
+        model: Optional[str] = None,
+        match_model: bool = False,
+    ) -> Tuple[List["JobRecord"], Optional[int]]:
+        """Newest-first page of jobs created before ``cursor``; returns the page and the next cursor."""
+        sources: List[List[int]] = []
+        if statuses:
+            sources = [self._status.get(status, []) for status in statuses]
+        elif match_model:
+            sources = [self._model.get(model, [])]
+        else:
+            sources = [self._order]
+        if match_model and statuses:
+            # Walk whichever index is smaller and check the other predicate per job.
+            by_model = self._model.get(model, [])
+            if len(by_model) < sum(len(seqs) for seqs in sources):
+                sources = [by_model]
+
+        candidates: List["JobRecord"] = []
+        for seqs in sources:
+            candidates.extend(self._walk(seqs, cursor, limit + 1, statuses, model, match_model))
+        candidates.sort(key=lambda job: job.seq, reverse=True)
+        page = candidates[:limit]
+        next_cursor = page[-1].seq if len(candidates) > limit else None
+        return page, next_cursor
+
+    def _walk(
+        self,
+        seqs: List[int],
+        cursor: Optional[int],
+        wanted: int,
+        statuses: Optional[Sequence[str]],
+        model: Optional[str],
+        match_model: bool,
+    ) -> Iterator["JobRecord"]:
+        index = bisect_left(seqs, cursor) if cursor is not None else len(seqs)
+        found = 0
+        while index > 0 and found < wanted:
+            index -= 1
+            job = self._by_seq.get(seqs[index])
+            if job is None:
+                continue
+            if statuses and job.status not in statuses:
+                continue
+            if match_model and job.model != model:
+                continue
+            found += 1
+            yield job
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import bool_option, float_option, int_option, section
+
+APP_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = APP_DIR.parent.parent
+DEFAULT_STORE_PATH = APP_DIR / "jobs.sqlite3"
+
+# Columns holding JSON documents; they are decoded on read.
+JSON_COLUMNS = ("payload", "settings", "meta")
+COLUMNS = (
+    "id",
+    "status",
+    "prompt",
+    "negative_prompt",
+    "model",
+    "backend",
+    "progress",
+    "image_url",
+    "error",
+    "cancel_requested",
+    "cache_key",
+    "pinned",
+    "priority",
+    "client_id",
+    "created_at",
+    "started_at",
+    "completed_at",
+) + JSON_COLUMNS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    prompt TEXT,
+    negative_prompt TEXT,
+    model TEXT,
+    backend TEXT,
+    progress INTEGER,
+    image_url TEXT,
+    error TEXT,
+    cancel_requested INTEGER,
+    cache_key TEXT,
+    pinned INTEGER,
+    priority INTEGER,
+    client_id TEXT,
+    created_at TEXT,
+    started_at TEXT,
+    completed_at TEXT,
+    payload TEXT,
+    settings TEXT,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS job_transitions (
+    job_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_transitions_job ON job_transitions (job_id);
+"""
+# Columns added after the first release: (name, type), applied to older journals at startup.
+_MIGRATIONS = (("pinned", "INTEGER"), ("priority", "INTEGER"), ("client_id", "TEXT"))
+_FLAGS = ("cancel_requested", "pinned")
+
+_STOP = object()
+# Backoff between attempts to commit a batch that failed.
+_RETRY_DELAY = 0.5
+_MAX_RETRY_DELAY = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StoreConfig:
+    enabled: bool = True
+    path: Path = DEFAULT_STORE_PATH
+    commit_interval: float = 0.2
+    batch_size: int = 256
+
+
+def load_store_config() -> StoreConfig:
+    raw = section("job_store")
+    defaults = StoreConfig()
+    path = raw.get("path")
+    interval_ms = float_option(raw.get("commit_interval_ms"))
+    return StoreConfig(
+        enabled=bool_option(raw.get("enabled"), defaults.enabled),
+        path=(PROJECT_ROOT / path) if path else defaults.path,
+        commit_interval=interval_ms / 1000.0 if interval_ms is not None else defaults.commit_interval,
+        batch_size=max(1, int_option(raw.get("batch_size"), defaults.batch_size)),
+    )
+
+
+def _encode(row: Dict[str, Any]) -> Dict[str, Any]:
+    encoded = dict(row)
+    for column in JSON_COLUMNS:
+        if column in encoded:
+            encoded[column] = json.dumps(encoded[column], default=str) if encoded[column] is not None else None
+    for column in _FLAGS:
+        if column in encoded:
+            encoded[column] = int(bool(encoded[column]))
+    return encoded
+
+
+def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+    decoded = dict(row)
+    for column in JSON_COLUMNS:
+        if decoded.get(column) is not None:
+            try:
+                decoded[column] = json.loads(decoded[column])
+            except json.JSONDecodeError:
+                decoded[column] = None
+    for column in _FLAGS:
+        if column in decoded:
+            decoded[column] = bool(decoded[column])
+    return decoded
+
+
+class JobStore:
+    """SQLite (WAL) journal of job state; writes are batched on a background thread."""
+
+    def __init__(self, config: StoreConfig):
+        self._config = config
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._transitions: List[Tuple[str, str, float]] = []
+        self._pending_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        config.path.parent.mkdir(parents=True, exist_ok=True)
+        self._reader = self._connect()
+        self._reader.executescript(_SCHEMA)
+        self._migrate()
+        self._writer = threading.Thread(target=self._writer_loop, name="codex-job-store", daemon=True)
+        self._writer.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.enabled
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self._config.path), check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _migrate(self) -> None:
+        existing = {row["name"] for row in self._reader.execute("PRAGMA table_info(jobs)")}
+        with self._reader:
+            for column, kind in _MIGRATIONS:
+                if column not in existing:
+                    self._reader.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    # Writes ----------------------------------------------------------------------
+    def save(self, row: Dict[str, Any]) -> None:
+        """Journal a job transition; rows may omit columns that did not change."""
+        with self._pending_lock:
+            merged = dict(self._pending.get(row["id"], {}))
+            merged.update(row)
+            self._pending[row["id"]] = merged
+            if "status" in row:
+                self._transitions.append((row["id"], row["status"], time.time()))
+        self._queue.put(row["id"])
+
+    def delete(self, job_ids: Iterable[str]) -> None:
+        ids = list(job_ids)
+        if ids:
+            self._queue.put(("delete", ids))
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._writer.join(timeout=10)
+        with self._read_lock:
+            self._reader.close()
+
+    def _writer_loop(self) -> None:
+        connection = self._connect()
+        stopping = False
+        retry: List[Any] = []
+        delay = _RETRY_DELAY
+        while not stopping:
+            # A batch that failed to commit goes first; finished jobs never save again on their own.
+            batch, retry = (retry, []) if retry else ([self._queue.get()], [])
+            deadline = time.monotonic() + self._config.commit_interval
+            while len(batch) < self._config.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [item for item in batch if item is not _STOP]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            try:
+                self._write(connection, batch)
+            except sqlite3.Error:
+                # Keep the writer alive; the rows stay pending and the batch is retried with backoff.
+                logger.exception("Failed to journal %d job updates, retrying in %.1fs", len(batch), delay)
+                if stopping:
+                    break
+                retry = batch
+                time.sleep(delay)
+                delay = min(_MAX_RETRY_DELAY, delay * 2)
+            else:
+                delay = _RETRY_DELAY
+        connection.close()
+
+    def _write(self, connection: sqlite3.Connection, batch: List[Any]) -> None:
+        rows: Dict[str, Dict[str, Any]] = {}
+        deletes: List[str] = []
+        with self._pending_lock:
+            for item in batch:
+                if isinstance(item, tuple):
+                    deletes.extend(item[1])
+                elif item in self._pending:
+                    rows[item] = self._pending[item]
+            transitions, self._transitions = self._transitions, []
+        try:
+            self._commit(connection, rows, transitions, deletes)
+        except sqlite3.Error:
+            with self._pending_lock:
+                self._transitions = transitions + self._transitions
+            raise
+        with self._pending_lock:
+            for job_id, row in rows.items():
+                if self._pending.get(job_id) is row:
+                    del self._pending[job_id]
+
+    def _commit(
+        self,
+        connection: sqlite3.Connection,
+        rows: Dict[str, Dict[str, Any]],
+        transitions: List[Any],
+        deletes: List[str],
+    ) -> None:
+        with connection:
+            for row in rows.values():
+                encoded = _encode(row)
+                columns = [column for column in COLUMNS if column in encoded]
+                updates = ", ".join(f"{column}=excluded.{column}" for column in columns if column != "id")
+                connection.execute(
+                    f"INSERT INTO jobs ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                    f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                    [encoded[column] for column in columns],
+                )
+            connection.executemany("INSERT INTO job_transitions (job_id, status, at) VALUES (?, ?, ?)", transitions)
+            for index in range(0, len(deletes), 500):
+                chunk = deletes[index : index + 500]
+                marks = ", ".join("?" for _ in chunk)
+                connection.execute(f"DELETE FROM jobs WHERE id IN ({marks})", chunk)
+                connection.execute(f"DELETE FROM job_transitions WHERE job_id IN ({marks})", chunk)
+
+    # Reads -----------------------------------------------------------------------
+    def load_all(self) -> List[Dict[str, Any]]:
+        """Rows for startup recovery; heavy JSON columns are only read for unfinished jobs."""
+        light = ", ".join(column for column in COLUMNS if column not in JSON_COLUMNS)
+        with self._read_lock:
+            rows = self._reader.execute(
+                f"SELECT {light}, "
+                "CASE WHEN status IN ('queued', 'running') THEN payload END AS payload, "
+                "CASE WHEN status IN ('queued', 'running') THEN settings END AS settings "
+                "FROM jobs ORDER BY created_at"
+            ).fetchall()
+        return [_decode(row) for row in rows]
+
+    def load_timings(self, limit: int) -> List[Dict[str, Any]]:
+        """The ``limit`` most recent generated (not cache-served) jobs, oldest first."""
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT model, backend, payload, started_at, completed_at FROM jobs "
+                "WHERE status = 'done' AND started_at IS NOT NULL AND completed_at IS NOT NULL "
+                "AND json_extract(meta, '$.cached') IS NULL "
+                "ORDER BY completed_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [_decode(row) for row in reversed(rows)]
+
+    def load_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._pending_lock:
+            pending = self._pending.get(job_id)
+        with self._read_lock:
+            row = self._reader.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None and pending is None:
+            return None
+        loaded = _decode(row) if row is not None else {}
+        loaded.update(pending or {})
+        return loaded
+
+    def load_details(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return ``{id: {"payload", "settings", "meta"}}`` for the requested jobs."""
+        details: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        with self._pending_lock:
+            for job_id in job_ids:
+                row = self._pending.get(job_id)
+                if row and all(column in row for column in JSON_COLUMNS):
+                    details[job_id] = {column: row[column] for column in JSON_COLUMNS}
+                else:
+                    missing.append(job_id)
+        for index in range(0, len(missing), 500):
+            chunk = missing[index : index + 500]
+            marks = ", ".join("?" for _ in chunk)
+            with self._read_lock:
+                rows = self._reader.execute(
+                    f"SELECT id, payload, settings, meta FROM jobs WHERE id IN ({marks})", chunk
+                ).fetchall()
+            for row in rows:
+                decoded = _decode(row)
+                details[decoded.pop("id")] = decoded
+        return details
+
+
+def open_job_store(config: Optional[StoreConfig] = None) -> Optional[JobStore]:
+    config = config or load_store_config()
+    return JobStore(config) if config.enabled else None
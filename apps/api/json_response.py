@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from starlette.responses import JSONResponse
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON via orjson; unknown types fall back to ``str`` like the stdlib encoders here."""
+    return orjson.dumps(value, default=str, option=_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` rendered with orjson, for hot endpoints that return plain dicts."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
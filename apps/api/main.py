@@ -1,30 +1,56 @@
 from __future__ import annotations
 
+import asyncio
 import copy
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Literal, Optional
 
-from fastapi import FastAPI, HTTPException, status
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 from .adapters import sdnext
-from .capabilities import get_capabilities
+from .capabilities import capability_cache, get_capabilities, probe_on_startup, refresh_capabilities
+from .compression import CompressionMiddleware, load_compression_config
+from .events import TERMINAL_STATUSES, EventBroker, format_sse
 from .extensions.loader import get_extensions, load_extensions
-from .queue import JobQueue
-from .settings_store import load_settings, save_settings
+from .job_store import open_job_store
+from .json_response import FastJSONResponse
+from .queue import JobQueue, parse_projection
+from .run_storage import IMMUTABLE_CACHE_CONTROL, RunsStaticFiles, strong_etag
+from .settings_store import load_settings, save_settings, settings_store, thaw
 
 APP_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = APP_DIR.parent.parent
 RUNS_DIR = PROJECT_ROOT / "runs"
 RUNS_DIR.mkdir(parents=True, exist_ok=True)
+SSE_HEARTBEAT_SECONDS = 15.0
 
-app = FastAPI(title="CodexWebUI API")
-app.mount("/runs", StaticFiles(directory=str(RUNS_DIR)), name="runs")
 
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if probe_on_startup():
+        capability_cache.warm()
+    job_queue.warmer.start()
+    yield
+    await sdnext.aclose()
+    sdnext.close()
+    job_queue.close()
+    settings_store.flush()
 
-job_queue = JobQueue(RUNS_DIR, load_settings)
+
+app = FastAPI(title="CodexWebUI API", lifespan=lifespan)
+app.add_middleware(CompressionMiddleware, config=load_compression_config())
+
+
+job_queue = JobQueue(RUNS_DIR, load_settings, store=open_job_store())
+settings_events = EventBroker(max_pending=16)
+settings_store.subscribe(
+    lambda snapshot: settings_events.publish({"version": snapshot.version, "settings": snapshot})
+)
 _ = load_extensions(app)
 
 
@@ -39,6 +65,7 @@ class GenerateRequest(BaseModel):
     seed: Optional[int] = None
     model: Optional[str] = None
     queue: Optional[bool] = True
+    priority: Optional[int] = None
 
 
 class CompileSettingsUpdate(BaseModel):
@@ -68,6 +95,27 @@ class ModelDefaultRequest(BaseModel):
     name: str
 
 
+class OutputSettingsUpdate(BaseModel):
+    format: Optional[Literal["png", "webp", "jpeg", "avif"]] = None
+    quality: Optional[int] = Field(None, ge=1, le=100)
+    lossless: Optional[bool] = None
+    metadata: Optional[Literal["embed", "sidecar", "none"]] = None
+
+
+class PriorityRequest(BaseModel):
+    priority: int
+
+
+class PinRequest(BaseModel):
+    pinned: bool = True
+
+
+class BulkCancelRequest(BaseModel):
+    client: Optional[str] = None
+    status: Optional[List[Literal["queued", "running"]]] = None
+    model: Optional[str] = None
+
+
 class UiSettingsUpdate(BaseModel):
     mobile_compact: Optional[bool] = None
 
@@ -78,27 +126,41 @@ class SettingsUpdate(BaseModel):
     attention: Optional[AttentionSettingsUpdate] = None
     performance: Optional[PerformanceSettingsUpdate] = None
     model: Optional[ModelSettingsUpdate] = None
+    output: Optional[OutputSettingsUpdate] = None
     ui: Optional[UiSettingsUpdate] = None
 
 
 @app.get("/health")
-def health() -> Dict[str, bool]:
+async def health() -> Dict[str, bool]:
     return {"ok": True}
 
 
 @app.get("/backend/health")
-def backend_health() -> Dict[str, Any]:
-    return sdnext.health()
+async def backend_health() -> Dict[str, Any]:
+    result = await sdnext.health_async()
+    result["backends"] = job_queue.backend_status()
+    return result
+
+
+@app.get("/backend/pool")
+async def backend_pool() -> Dict[str, Any]:
+    return {"items": job_queue.backend_status()}
 
 
 @app.get("/backend/capabilities")
-def backend_capabilities() -> Dict[str, Any]:
-    return get_capabilities()
+async def backend_capabilities() -> Dict[str, Any]:
+    # Served from memory; only a cold or stale cache waits on the probe subprocess.
+    return await run_in_threadpool(get_capabilities)
+
+
+@app.post("/backend/capabilities/refresh")
+async def backend_capabilities_refresh() -> Dict[str, Any]:
+    return await run_in_threadpool(refresh_capabilities)
 
 
 @app.get("/backend/models")
-def backend_models() -> Dict[str, Any]:
-    models = sdnext.list_models()
+async def backend_models() -> Dict[str, Any]:
+    models = await sdnext.list_models_async()
     settings = load_settings()
     default_name = None
     if isinstance(settings, dict):
@@ -108,49 +170,208 @@ def backend_models() -> Dict[str, Any]:
 
 
 @app.post("/backend/models/default")
-def set_default_model(payload: ModelDefaultRequest) -> Dict[str, Any]:
-    models = sdnext.list_models()
+async def set_default_model(payload: ModelDefaultRequest) -> Dict[str, Any]:
+    models = await sdnext.list_models_async()
     valid_names = {item.get("name") for item in models.get("items", []) if item.get("name")}
     if payload.name not in valid_names:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Model not found")
 
-    current = load_settings()
+    current = thaw(load_settings())
     current.setdefault("model", {})["name"] = payload.name
     save_settings(current)
-    return {"default": payload.name, "requires_restart": True}
+    # Backends switch as soon as they are idle; no restart needed.
+    loading = job_queue.warmer.load_default()
+    return {"default": payload.name, "requires_restart": False, "loading": loading}
+
+
+@app.get("/backend/warmup")
+async def backend_warmup() -> Dict[str, Any]:
+    return job_queue.warmer.stats()
+
+
+@app.get("/jobs", response_model=None)
+async def list_jobs(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    model: Optional[str] = None,
+    view: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> Any:
+    statuses = [item for item in (status_filter or "").split(",") if item] or None
+    view, projection = parse_projection(view, fields)
+    etag = job_queue.list_etag(limit, cursor, statuses, model, view, projection)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    page = await run_in_threadpool(
+        job_queue.list_jobs, limit=limit, cursor=cursor, statuses=statuses, model=model, view=view, fields=projection
+    )
+    return FastJSONResponse(page, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def _event_stream(
+    request: Request, job_id: Optional[str], snapshot: Callable[[], List[Dict[str, Any]]]
+) -> StreamingResponse:
+    async def stream():
+        with job_queue.events.subscribe(job_id) as events:
+            for item in snapshot():
+                yield format_sse(item)
+                if job_id and item.get("status") in TERMINAL_STATUSES:
+                    return
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+                if job_id and event.get("status") in TERMINAL_STATUSES:
+                    return
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+
+@app.get("/jobs/events")
+async def job_events(request: Request) -> StreamingResponse:
+    return _event_stream(request, None, job_queue.active_jobs)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events_for(job_id: str, request: Request) -> StreamingResponse:
+    job_queue.get_job(job_id)
+    return _event_stream(request, job_id, lambda: [job_queue.get_job(job_id)])
+
+
+@app.get("/jobs/{job_id}", response_model=None)
+async def get_job(job_id: str, view: Optional[str] = None, fields: Optional[str] = None) -> FastJSONResponse:
+    view, projection = parse_projection(view, fields)
+    return FastJSONResponse(await run_in_threadpool(job_queue.get_job, job_id, view, projection))
+
+
+def _client_id(request: Request) -> Optional[str]:
+    """Fair-share key: an explicit ``X-Client-Id`` header, else the caller's address."""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else None)
+
+
+def _enqueue(payload: Dict[str, Any], request: Request) -> Dict[str, Any]:
+    payload.pop("queue", None)
+    priority = payload.pop("priority", None)
+    return job_queue.enqueue(payload, priority=priority, client_id=_client_id(request))
 
 
-@app.get("/jobs")
-def list_jobs() -> Dict[str, Any]:
-    return {"items": job_queue.list_jobs()}
+@app.post("/jobs", response_model=None)
+async def create_job(request: GenerateRequest, http_request: Request) -> FastJSONResponse:
+    # Admission and the position/ETA projection walk the whole queue; keep them off the loop.
+    job = await run_in_threadpool(_enqueue, request.model_dump(exclude_none=True), http_request)
+    return FastJSONResponse({"job": job})
 
 
-@app.get("/jobs/{job_id}")
-def get_job(job_id: str) -> Dict[str, Any]:
-    return job_queue.get_job(job_id)
+@app.post("/jobs/{job_id}/priority")
+async def set_job_priority(job_id: str, request: PriorityRequest) -> Dict[str, Any]:
+    return job_queue.set_priority(job_id, request.priority)
 
 
-@app.post("/jobs")
-def create_job(request: GenerateRequest) -> Dict[str, Any]:
-    payload = request.model_dump(exclude_none=True)
-    payload.pop("queue", None)
-    job = job_queue.enqueue(payload)
-    return {"job": job}
+@app.get("/scheduler")
+async def scheduler_stats() -> Dict[str, Any]:
+    return job_queue.scheduler_stats()
 
 
 @app.delete("/jobs/{job_id}")
-def cancel_job(job_id: str) -> Dict[str, Any]:
-    return job_queue.cancel_job(job_id)
+async def cancel_job(job_id: str) -> Dict[str, Any]:
+    # Cancelling a running job interrupts its backend, which is a blocking call.
+    return await run_in_threadpool(job_queue.cancel_job, job_id)
+
+
+@app.post("/jobs/cancel")
+async def cancel_jobs(request: BulkCancelRequest) -> Dict[str, Any]:
+    if request.client is None and request.status is None and request.model is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Give at least one of client, status or model"
+        )
+    return await run_in_threadpool(job_queue.cancel_jobs, request.client, request.status, request.model)
+
+
+@app.post("/jobs/{job_id}/pin")
+async def pin_job(job_id: str, request: PinRequest) -> Dict[str, Any]:
+    return await run_in_threadpool(job_queue.pin_job, job_id, request.pinned)
+
+
+@app.get("/runs/{job_id}/thumb", response_model=None)
+async def run_thumbnail(
+    request: Request, job_id: str, w: Optional[int] = Query(None, ge=16, le=4096)
+) -> Response:
+    # Resolving the output can hit the filesystem and the job journal.
+    source = await run_in_threadpool(job_queue.output_path, job_id)
+    if source is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Output not found")
+    try:
+        path = await asyncio.wrap_future(job_queue.thumbnails.get(job_id, source, w))
+    except Exception as exc:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Unable to render thumbnail") from exc
+    # Outputs never change once published, so derivatives can be cached forever.
+    stat = await run_in_threadpool(path.stat)
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": strong_etag(path, stat)}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(path, headers=headers, stat_result=stat)
+
+
+@app.post("/runs/rebuild")
+async def rebuild_runs_manifest() -> Dict[str, Any]:
+    return {"entries": await run_in_threadpool(job_queue.runs.rebuild)}
+
+
+@app.get("/runs/gc")
+async def runs_gc_stats() -> Dict[str, Any]:
+    return job_queue.runs_gc.stats()
+
+
+@app.post("/runs/gc")
+async def collect_runs() -> Dict[str, Any]:
+    evicted = await run_in_threadpool(job_queue.runs_gc.collect)
+    return {"evicted": [entry.id for entry in evicted], **job_queue.runs_gc.stats()}
+
+
+@app.get("/thumbnails")
+async def thumbnail_stats() -> Dict[str, Any]:
+    return job_queue.thumbnails.stats()
+
+
+@app.get("/cache")
+async def cache_stats() -> Dict[str, Any]:
+    return job_queue.cache_stats()
 
 
 @app.get("/extensions")
-def list_extensions() -> Dict[str, Any]:
+async def list_extensions() -> Dict[str, Any]:
     return {"items": get_extensions()}
 
 
 @app.get("/settings")
-def get_settings() -> Dict[str, Any]:
-    return load_settings()
+async def get_settings(response: Response) -> Dict[str, Any]:
+    snapshot = load_settings()
+    response.headers["X-Settings-Version"] = str(snapshot.version)
+    return snapshot
+
+
+@app.get("/settings/events")
+async def settings_stream(request: Request) -> StreamingResponse:
+    async def stream():
+        with settings_events.subscribe() as events:
+            snapshot = load_settings()
+            yield format_sse({"version": snapshot.version, "settings": snapshot}, name="settings")
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, name="settings")
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
 
 
 def _deep_merge(base: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
@@ -167,25 +388,25 @@ def _deep_merge(base: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]
 
 
 @app.post("/settings")
-def update_settings(payload: SettingsUpdate) -> Dict[str, Any]:
+async def update_settings(payload: SettingsUpdate) -> Dict[str, Any]:
     current = load_settings()
     updates = payload.model_dump(exclude_unset=True)
-    merged = _deep_merge(copy.deepcopy(current), updates)
-    save_settings(merged)
-    return merged
+    merged = _deep_merge(thaw(current), updates)
+    return save_settings(merged)
 
 
 @app.post("/generate")
-def generate(request: GenerateRequest) -> Dict[str, Any]:
+async def generate(request: GenerateRequest, http_request: Request) -> Dict[str, Any]:
     payload = request.model_dump(exclude_none=True)
-    queue_mode = payload.pop("queue", True)
+    queue_mode = payload.get("queue", True)
 
     if queue_mode:
-        job = job_queue.enqueue(payload)
-        return {"job": job}
-
-    return job_queue.run_sync(payload)
-
+        return {"job": await run_in_threadpool(_enqueue, payload, http_request)}
 
+    payload.pop("queue", None)
+    payload.pop("priority", None)
+    return await job_queue.run_async(payload)
 
 
+# Mounted last so routes under /runs (thumbnails) take precedence over the static files.
+app.mount("/runs", RunsStaticFiles(storage=job_queue.runs), name="runs")
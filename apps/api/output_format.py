@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FORMATS = ("png", "webp", "jpeg", "avif")
+METADATA_MODES = ("embed", "sidecar", "none")
+SUFFIXES = {"png": ".png", "webp": ".webp", "jpeg": ".jpg", "avif": ".avif"}
+_PIL_FORMATS = {"png": "PNG", "webp": "WEBP", "jpeg": "JPEG", "avif": "AVIF"}
+# Keys copied from SD.Next's info into the compact sidecar.
+_SIDECAR_KEYS = (
+    "prompt",
+    "negative_prompt",
+    "seed",
+    "subseed",
+    "steps",
+    "sampler_name",
+    "cfg_scale",
+    "width",
+    "height",
+    "sd_model_name",
+    "sd_model_hash",
+    "batch",
+)
+_EXIF_IFD = 0x8769
+_USER_COMMENT = 0x9286
+
+
+@dataclass(frozen=True)
+class OutputFormat:
+    format: str = "png"
+    quality: int = 90
+    lossless: bool = False
+    metadata: str = "embed"
+
+    @property
+    def suffix(self) -> str:
+        return SUFFIXES[self.format]
+
+    @property
+    def reencodes(self) -> bool:
+        # SD.Next already sends PNG with its parameters chunk; pass it through untouched.
+        return self.format != "png"
+
+
+def output_format(settings: Optional[Dict[str, Any]]) -> OutputFormat:
+    """Read the ``output`` section of a settings snapshot, falling back to PNG passthrough."""
+    raw = (settings or {}).get("output")
+    if not isinstance(raw, dict):
+        return OutputFormat()
+    defaults = OutputFormat()
+    fmt = str(raw.get("format") or defaults.format).lower()
+    fmt = "jpeg" if fmt == "jpg" else fmt
+    metadata = str(raw.get("metadata") or defaults.metadata).lower()
+    try:
+        quality = int(raw.get("quality", defaults.quality))
+    except (TypeError, ValueError):
+        quality = defaults.quality
+    return OutputFormat(
+        format=fmt if fmt in FORMATS else defaults.format,
+        quality=min(100, max(1, quality)),
+        lossless=bool(raw.get("lossless", defaults.lossless)),
+        metadata=metadata if metadata in METADATA_MODES else defaults.metadata,
+    )
+
+
+def infotext(meta: Optional[Dict[str, Any]]) -> Optional[str]:
+    infotexts = (meta or {}).get("infotexts")
+    if isinstance(infotexts, list) and infotexts and isinstance(infotexts[0], str):
+        return infotexts[0]
+    return None
+
+
+def compact_metadata(meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    meta = meta or {}
+    compact = {key: meta[key] for key in _SIDECAR_KEYS if meta.get(key) is not None}
+    text = infotext(meta)
+    if text:
+        compact["infotext"] = text
+    return compact
+
+
+def write_sidecar(image_path: Path, meta: Optional[Dict[str, Any]]) -> Path:
+    sidecar = image_path.with_suffix(".json")
+    temp = sidecar.with_name(f".{sidecar.name}.tmp")
+    temp.write_text(json.dumps(compact_metadata(meta), separators=(",", ":"), default=str), encoding="utf-8")
+    os.replace(temp, sidecar)
+    return sidecar
+
+
+def encode_image(source: str, destination: str, output: OutputFormat, comment: Optional[str]) -> int:
+    """Re-encode ``source`` into ``destination``; runs in an encoder process."""
+    from PIL import Image, PngImagePlugin
+
+    with Image.open(source) as image:
+        image.load()
+        if output.format == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        options: Dict[str, Any] = {}
+        if output.format == "webp":
+            options = {"lossless": True, "quality": 100, "method": 4} if output.lossless else {"quality": output.quality, "method": 4}
+        elif output.format == "jpeg":
+            options = {"quality": output.quality, "optimize": True, "progressive": True}
+        elif output.format == "avif":
+            options = {"quality": output.quality}
+        if comment:
+            if output.format == "png":
+                info = PngImagePlugin.PngInfo()
+                info.add_text("parameters", comment)
+                options["pnginfo"] = info
+            else:
+                # Same UserComment encoding SD.Next uses, so its PNG Info tab can read it back.
+                exif = Image.Exif()
+                exif.get_ifd(_EXIF_IFD)[_USER_COMMENT] = b"UNICODE\x00" + comment.encode("utf-16-be")
+                options["exif"] = exif.tobytes()
+        image.save(destination, format=_PIL_FORMATS[output.format], **options)
+    return os.path.getsize(destination)
+
+
+class Encoder:
+    """Process pool for image work; keeps Pillow and CPU-heavy encoding out of the API process."""
+
+    def __init__(self, processes: int = 2):
+        self._processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.available = importlib.util.find_spec("PIL") is not None
+        if not self.available:
+            logger.warning("Pillow is not installed; outputs are stored as PNG")
+
+    def run(self, function: Callable[..., T], *args: Any) -> T:
+        """Run a picklable top-level ``function`` in an encoder process and wait for it."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._processes, mp_context=multiprocessing.get_context("spawn")
+                )
+            pool = self._pool
+        return pool.submit(function, *args).result()
+
+    def encode(self, source: Path, destination: Path, output: OutputFormat, comment: Optional[str]) -> int:
+        return self.run(encode_image, str(source), str(destination), output, comment)
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
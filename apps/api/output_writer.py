@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import bool_option, int_option, section
+from .output_format import Encoder, OutputFormat, infotext, write_sidecar
+
+_STOP = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WriterConfig:
+    workers: int = 2
+    queue_size: int = 64
+    fsync: bool = False
+    encode_processes: int = 2
+
+
+@dataclass(frozen=True)
+class PublishedOutput:
+    path: Path
+    format: str
+    size: int
+    source_size: int
+
+    def to_meta(self) -> Dict[str, Any]:
+        return {"format": self.format, "bytes": self.size, "sourceBytes": self.source_size}
+
+
+@dataclass
+class _Task:
+    temp: Path
+    final: Path
+    output: Optional[OutputFormat]
+    meta: Optional[Dict[str, Any]]
+    future: "Future[PublishedOutput]"
+
+
+def load_writer_config() -> WriterConfig:
+    raw = section("output_writer")
+    defaults = WriterConfig()
+    return WriterConfig(
+        workers=max(1, int_option(raw.get("workers"), defaults.workers)),
+        queue_size=max(1, int_option(raw.get("queue_size"), defaults.queue_size)),
+        fsync=bool_option(raw.get("fsync"), defaults.fsync),
+        encode_processes=max(1, int_option(raw.get("encode_processes"), defaults.encode_processes)),
+    )
+
+
+def _fsync(path: Path, directory: bool = False) -> None:
+    flags = os.O_RDONLY | (getattr(os, "O_DIRECTORY", 0) if directory else 0)
+    try:
+        fd = os.open(str(path), flags)
+    except OSError:
+        # Directories cannot be opened for fsync on every platform (e.g. Windows).
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publish_file(temp: Path, final: Path, fsync: bool = False) -> Path:
+    """Atomically move a fully written ``temp`` file to ``final``."""
+    if fsync:
+        _fsync(temp)
+    final.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temp, final)
+    if fsync:
+        _fsync(final.parent, directory=True)
+    return final
+
+
+class OutputWriter:
+    """Bounded pool of threads that publish finished outputs off the GPU worker threads.
+
+    Images are written to a temp file next to ``runs/`` and only appear under their final
+    name once complete, so readers never see a partial file. Re-encoding to the configured
+    output format happens in an :class:`Encoder` process. ``publish`` blocks when the queue
+    is full, which throttles workers instead of buffering without bound.
+    """
+
+    def __init__(self, config: WriterConfig):
+        self._config = config
+        self._encoder = Encoder(config.encode_processes)
+        self._queue: "queue.Queue[Optional[_Task]]" = queue.Queue(maxsize=config.queue_size)
+        self._threads: List[threading.Thread] = []
+        for index in range(config.workers):
+            thread = threading.Thread(target=self._loop, name=f"codex-output-writer-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def encoder(self) -> Encoder:
+        return self._encoder
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def publish(
+        self,
+        temp: Path,
+        final: Path,
+        output: Optional[OutputFormat] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> "Future[PublishedOutput]":
+        """Queue ``temp`` for publishing; the final suffix follows the output format."""
+        future: "Future[PublishedOutput]" = Future()
+        self._queue.put(_Task(temp, final, output, meta, future))
+        return future
+
+    def close(self) -> None:
+        """Finish queued work, then stop the writer threads."""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout=30)
+        self._encoder.close()
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = self._publish(item)
+            except BaseException as exc:
+                logger.exception("Failed to publish %s", item.final)
+                try:
+                    item.temp.unlink()
+                except OSError:
+                    pass
+                item.future.set_exception(exc)
+            else:
+                item.future.set_result(result)
+
+    def _publish(self, task: _Task) -> PublishedOutput:
+        temp, final, output = task.temp, task.final, task.output
+        source_size = temp.stat().st_size
+        fmt = "png"
+        comment = infotext(task.meta) if output and output.metadata == "embed" else None
+        if output and output.reencodes and self._encoder.available:
+            encoded = temp.with_suffix(output.suffix)
+            try:
+                self._encoder.encode(temp, encoded, output, comment)
+            except Exception:
+                # Keep the PNG rather than losing the image.
+                logger.exception("Failed to encode %s as %s", final.name, output.format)
+                try:
+                    encoded.unlink()
+                except OSError:
+                    pass
+            else:
+                temp.unlink()
+                temp, final, fmt = encoded, final.with_suffix(output.suffix), output.format
+        size = temp.stat().st_size
+        publish_file(temp, final, self._config.fsync)
+        if output and output.metadata == "sidecar":
+            write_sidecar(final, task.meta)
+        return PublishedOutput(path=final, format=fmt, size=size, source_size=source_size)
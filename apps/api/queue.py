@@ -1,76 +1,423 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import itertools
+import logging
 import threading
 import queue
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Set, Tuple
 from uuid import uuid4
 
 from fastapi import HTTPException, status
 
 from .adapters import sdnext
+from .admission import check_admission, load_admission_config, retry_after
+from .affinity import AffinityPolicy, load_affinity_config
+from .backends import Backend, BackendPool, is_unreachable
+from .coalesce import batch_params, can_join, load_coalesce_config, split_runs
+from .eta import EtaEstimator, load_eta_config
+from .events import TERMINAL_STATUSES, EventBroker
+from .job_index import JobIndex
+from .job_store import JobStore
+from .output_format import output_format
+from .output_writer import OutputWriter, PublishedOutput, load_writer_config
+from .result_cache import ResultCache, link_or_copy, load_cache_config
+from .run_gc import RunCollector, load_run_gc_config
+from .run_storage import RunEntry, RunStorage
+from .retention import SnapshotInterner, load_retention_config, select_evictions
+from .scheduler import Scheduler, load_scheduler_config
+from .thumbnails import ThumbnailCache, load_thumb_config
+from .warmup import ModelWarmer, load_warmup_config
 
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+# How long to wait before asking a backend again which checkpoint it has loaded.
+_MODEL_RECHECK_SECONDS = 30.0
+_RECENT_MODELS = 50
+# Journal rows on one backend that started this close together belonged to one batch.
+_BATCH_WINDOW = timedelta(seconds=1)
+# Age up to which a queue projection is reused for published events, however much has changed.
+_EVENT_LIVE_MAX_AGE = 1.0
+# Live fields by job id, plus ``(job id, client)`` of the queued jobs in dispatch order.
+_Projection = Tuple[Dict[str, Dict[str, Any]], List[Tuple[str, Optional[str]]]]
+
+# Fields of the ``summary`` view; ``full`` adds the heavy ``meta`` and ``settings`` documents.
+SUMMARY_FIELDS = (
+    "id",
+    "prompt",
+    "negativePrompt",
+    "model",
+    "backend",
+    "status",
+    "progress",
+    "step",
+    "totalSteps",
+    "eta",
+    "imageUrl",
+    "thumbUrl",
+    "error",
+    "cancelRequested",
+    "pinned",
+    "priority",
+    "position",
+    "estimatedStart",
+    "estimatedFinish",
+    "createdAt",
+    "startedAt",
+    "completedAt",
+)
+DETAIL_FIELDS = ("meta", "settings")
+# Summary fields owned by the scheduler and ETA projection rather than the job itself.
+LIVE_FIELDS = ("position", "estimatedStart", "estimatedFinish")
+VIEWS = ("summary", "full")
+
+
+@dataclass(slots=True)
 class JobRecord:
     id: str
-    payload: Dict[str, Any]
+    payload: Optional[Dict[str, Any]]
     prompt: str
     negative_prompt: Optional[str]
     model: Optional[str]
-    settings_snapshot: Dict[str, Any]
+    settings_snapshot: Optional[Dict[str, Any]]
+    backend: Optional[str] = None
     status: str = "queued"
     progress: int = 0
+    step: Optional[int] = None
+    total_steps: Optional[int] = None
+    eta_seconds: Optional[float] = None
     image_url: Optional[str] = None
     meta: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     cancel_requested: bool = False
+    cache_key: Optional[str] = None
+    # Pinned (favourited) outputs are never removed by the runs/ garbage collector.
+    pinned: bool = False
+    priority: int = 0
+    client_id: Optional[str] = None
+    # Finished jobs keep payload/settings/meta only in the job store once journaled.
+    archived: bool = False
+    seq: int = 0
+    # Bumped on every published change; the cached summary is valid for one revision.
+    rev: int = 0
+    summary_cache: Optional[Tuple[int, Dict[str, Any]]] = field(default=None, repr=False, compare=False)
     created_at: datetime = field(default_factory=datetime.utcnow)
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
 
-    def to_dict(self) -> Dict[str, Any]:
-        return {
+    def to_dict(self, detail: Optional[Dict[str, Any]] = None, live: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        meta = detail.get("meta") if detail else self.meta
+        settings = detail.get("settings") if detail else self.settings_snapshot
+        return {**self.summary(), **_live(live), "meta": meta, "settings": settings}
+
+    def summary(self) -> Dict[str, Any]:
+        """The lean view, built once per revision; callers must not mutate the returned dict."""
+        rev = self.rev
+        cached = self.summary_cache
+        if cached is not None and cached[0] == rev:
+            return cached[1]
+        summary = {
             "id": self.id,
             "prompt": self.prompt,
             "negativePrompt": self.negative_prompt,
             "model": self.model,
+            "backend": self.backend,
             "status": self.status,
             "progress": self.progress,
+            "step": self.step,
+            "totalSteps": self.total_steps,
+            "eta": self.eta_seconds,
             "imageUrl": self.image_url,
-            "meta": self.meta,
-            "settings": self.settings_snapshot,
+            "thumbUrl": f"/runs/{self.id}/thumb" if self.image_url else None,
             "error": self.error,
             "cancelRequested": self.cancel_requested,
+            "pinned": self.pinned,
+            "priority": self.priority,
             "createdAt": _iso(self.created_at),
             "startedAt": _iso(self.started_at) if self.started_at else None,
             "completedAt": _iso(self.completed_at) if self.completed_at else None,
         }
+        self.summary_cache = (rev, summary)
+        return summary
+
+    def project(
+        self,
+        view: str = "full",
+        fields: Optional[Sequence[str]] = None,
+        detail: Optional[Dict[str, Any]] = None,
+        live: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Render a view; ``live`` fields come from the scheduler, so they are merged in here."""
+        if fields:
+            source = self.summary() if not any(name in DETAIL_FIELDS for name in fields) else self.to_dict(detail)
+            live = _live(live)
+            return {name: live[name] if name in LIVE_FIELDS else source[name] for name in fields}
+        if view == "summary":
+            return {**self.summary(), **_live(live)}
+        return self.to_dict(detail, live)
+
+
+    def to_row(self, details: bool = False) -> Dict[str, Any]:
+        row: Dict[str, Any] = {
+            "id": self.id,
+            "status": self.status,
+            "prompt": self.prompt,
+            "negative_prompt": self.negative_prompt,
+            "model": self.model,
+            "backend": self.backend,
+            "progress": self.progress,
+            "image_url": self.image_url,
+            "error": self.error,
+            "cancel_requested": self.cancel_requested,
+            "cache_key": self.cache_key,
+            "pinned": self.pinned,
+            "priority": self.priority,
+            "client_id": self.client_id,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+        }
+        if details and not self.archived:
+            row["payload"] = self.payload
+            row["settings"] = self.settings_snapshot
+            row["meta"] = self.meta
+        return row
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "JobRecord":
+        return cls(
+            id=row["id"],
+            payload=row.get("payload"),
+            prompt=row.get("prompt") or "",
+            negative_prompt=row.get("negative_prompt"),
+            model=row.get("model"),
+            settings_snapshot=row.get("settings"),
+            backend=row.get("backend"),
+            status=row.get("status") or "queued",
+            progress=row.get("progress") or 0,
+            image_url=row.get("image_url"),
+            meta=row.get("meta"),
+            error=row.get("error"),
+            cancel_requested=bool(row.get("cancel_requested")),
+            cache_key=row.get("cache_key"),
+            pinned=bool(row.get("pinned")),
+            priority=row.get("priority") or 0,
+            client_id=row.get("client_id"),
+            created_at=_parse_dt(row.get("created_at")) or datetime.utcnow(),
+            started_at=_parse_dt(row.get("started_at")),
+            completed_at=_parse_dt(row.get("completed_at")),
+        )
+
+
+def parse_projection(view: Optional[str], fields: Optional[str]) -> Tuple[str, Optional[List[str]]]:
+    """Validate the ``view``/``fields`` query parameters of the job endpoints."""
+    view = view or "full"
+    if view not in VIEWS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"view must be one of {', '.join(VIEWS)}")
+    if not fields:
+        return view, None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in SUMMARY_FIELDS and name not in DETAIL_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in names:
+        names.insert(0, "id")
+    return view, names
+
+
+def _live(live: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    live = live or {}
+    return {name: live.get(name) for name in LIVE_FIELDS}
 
 
 def _iso(dt: datetime) -> str:
     return dt.replace(microsecond=int(dt.microsecond / 1000) * 1000).isoformat() + "Z"
 
 
+def _parse_dt(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.rstrip("Z"))
+    except ValueError:
+        return None
+
+
 class JobQueue:
-    def __init__(self, runs_dir: Path, settings_loader):
+    def __init__(
+        self,
+        runs_dir: Path,
+        settings_loader,
+        backends: Optional[BackendPool] = None,
+        cache: Optional[ResultCache] = None,
+        store: Optional[JobStore] = None,
+    ):
         self._runs_dir = runs_dir
+        self.runs = RunStorage(runs_dir)
+        self._temp_dir = runs_dir / ".tmp"
+        self._clear_temp()
+        self._writer = OutputWriter(load_writer_config())
+        self.thumbnails = ThumbnailCache(runs_dir / ".thumbs", load_thumb_config(), self._writer.encoder)
         self._settings_loader = settings_loader
-        self._queue: "queue.Queue[str]" = queue.Queue()
-        self._jobs: Dict[str, JobRecord] = {}
+        self._store = store
+        self._retention = load_retention_config()
+        self._interner = SnapshotInterner()
+        self._retention_wakeup = threading.Event()
+        self._cache = cache or ResultCache(runs_dir / ".cache", load_cache_config())
+        self._backends = backends or BackendPool(sdnext.backend_configs(), sdnext.health_interval())
+        self._scheduler = Scheduler(load_scheduler_config())
+        self._affinity = AffinityPolicy(load_affinity_config())
+        self._admission = load_admission_config()
+        self._eta = EtaEstimator(load_eta_config())
+        # (cache key, monotonic time computed, projection)
+        self._live_cache: Tuple[Any, float, _Projection] = (None, 0.0, ({}, []))
+        # Job id -> ids of the batch it is executing in, shared by every job of that batch.
+        self._inflight: Dict[str, List[str]] = {}
+        # Ids of jobs whose txt2img request has been sent; only those can be interrupted.
+        self._generating: Set[str] = set()
+        # Models of recent submissions, used to guess what an idle backend should preload.
+        self._recent_models: Deque[str] = deque(maxlen=_RECENT_MODELS)
+        self._coalesce = load_coalesce_config()
+        self._jobs = JobIndex()
+        self._versions = itertools.count(1)
+        self._version = 0
+        # Versions restart with the process; list ETags mix this in so old ones never match.
+        self._instance = uuid4().hex
         self._lock = threading.Lock()
-        self._worker = threading.Thread(target=self._worker_loop, name="codex-job-worker", daemon=True)
-        self._worker.start()
+        self.events = EventBroker()
+        self._progress_interval = sdnext.progress_interval()
+        self._workers: List[threading.Thread] = []
+        self._backend_queues: Dict[str, "queue.Queue[List[str]]"] = {}
+        for backend in self._backends.backends:
+            backend_queue: "queue.Queue[List[str]]" = queue.Queue()
+            self._backend_queues[backend.name] = backend_queue
+            for index in range(backend.workers):
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    args=(backend, backend_queue),
+                    name=f"codex-job-worker-{backend.name}-{index}",
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
+        # Restored jobs can finish from the result cache right away, which records the output
+        # with the collector, so it has to exist first.
+        self.runs_gc = RunCollector(self.runs, load_run_gc_config(), self._on_runs_collected)
+        self.warmer = ModelWarmer(
+            self._backends, load_warmup_config(), self._preload_model, self._predict_model, self._default_model
+        )
+        if self._store:
+            self._restore()
+            self._sweep()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="codex-job-dispatcher", daemon=True)
+        self._dispatcher.start()
+        self._retention_thread = threading.Thread(
+            target=self._retention_loop, name="codex-job-retention", daemon=True
+        )
+        self._retention_thread.start()
+
+    def close(self) -> None:
+        self.thumbnails.close()
+        self._writer.close()
+        if self._store:
+            self._store.close()
+
+    def _clear_temp(self) -> None:
+        """Drop partial outputs left behind by a previous process."""
+        self._temp_dir.mkdir(parents=True, exist_ok=True)
+        for leftover in self._temp_dir.iterdir():
+            try:
+                leftover.unlink()
+            except OSError:
+                pass
+        sdnext.clear_handoff()
+
+    def _restore(self) -> None:
+        """Reload the journal; unfinished jobs go back on the queue in creation order."""
+        resubmit: List[JobRecord] = []
+        for row in self._store.load_all():
+            job = JobRecord.from_row(row)
+            job.settings_snapshot = self._interner.intern(job.settings_snapshot)
+            if job.status in ("queued", "running"):
+                job.backend = None
+                job.started_at = None
+                if job.cancel_requested or job.payload is None:
+                    job.status = "error"
+                    job.error = "Cancelled" if job.cancel_requested else "Lost during restart"
+                    job.progress = 100
+                    job.completed_at = datetime.utcnow()
+                else:
+                    job.status = "queued"
+                    job.progress = 0
+                    resubmit.append(job)
+                self._store.save(job.to_row())
+            if job.status in TERMINAL_STATUSES:
+                job.archived = True
+                job.payload = None
+                job.settings_snapshot = None
+            self._jobs.add(job)
+        self._learn_timings()
+        for job in resubmit:
+            self._submit(job)
+
+    def _learn_timings(self) -> None:
+        """Replay recent generations from the journal into the ETA estimator.
+
+        Jobs of one coalesced batch share a backend and start together, before any of them
+        completes, so they are summed back into a single observation. Journal timings include the model swap and result
+        publishing, which makes the replayed rates slightly pessimistic until live batches
+        refine them.
+        """
+        if not self._eta.history_jobs:
+            return
+        batches: List[Dict[str, Any]] = []
+        for row in self._store.load_timings(self._eta.history_jobs):
+            started = _parse_dt(row.get("started_at"))
+            completed = _parse_dt(row.get("completed_at"))
+            if started is None or completed is None:
+                continue
+            units = self._eta.units(row.get("payload"))
+            last = batches[-1] if batches else None
+            if (
+                last
+                and last["backend"] == row.get("backend")
+                and started < last["first_completed"]
+                and abs(started - last["started"]) < _BATCH_WINDOW
+            ):
+                last["units"] += units
+                last["completed"] = max(last["completed"], completed)
+            else:
+                batches.append(
+                    {
+                        "model": row.get("model"),
+                        "backend": row.get("backend"),
+                        "started": started,
+                        "first_completed": completed,
+                        "completed": completed,
+                        "units": units,
+                    }
+                )
+        for batch in batches:
+            self._eta.observe(batch["model"], batch["units"], (batch["completed"] - batch["started"]).total_seconds())
 
     # API helpers -----------------------------------------------------------------
-    def enqueue(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def enqueue(
+        self, payload: Dict[str, Any], priority: Optional[int] = None, client_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        self._admit(client_id)
         job_id = uuid4().hex[:12]
         prompt = payload.get("prompt") or ""
         negative_prompt = payload.get("negative_prompt")
         model = payload.get("model")
-        settings_snapshot = self._settings_loader()
+        settings_snapshot = self._interner.intern(self._settings_loader())
         job = JobRecord(
             id=job_id,
             payload=payload,
@@ -79,70 +426,687 @@ class JobQueue:
             model=model,
             settings_snapshot=settings_snapshot,
             progress=0,
+            cache_key=self._cache.key_for(payload, settings_snapshot),
+            priority=self._scheduler.clamp(priority),
+            client_id=client_id,
         )
         with self._lock:
-            self._jobs[job_id] = job
-        self._queue.put(job_id)
+            self._jobs.add(job)
+            over_limit = len(self._jobs) > self._retention.max_jobs
+        if over_limit:
+            self._retention_wakeup.set()
+        if model:
+            self._recent_models.append(model)
+        if self._store:
+            self._store.save(job.to_row(details=True))
+        self._submit(job)
+        # Projecting the whole queue per POST would make a burst of submissions quadratic;
+        # position and ETA are filled in when the job is read.
         return job.to_dict()
 
-    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+    def list_jobs(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        statuses: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        view: str = "full",
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        try:
+            position = int(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
         with self._lock:
-            jobs = list(self._jobs.values())
-        jobs.sort(key=lambda job: job.created_at, reverse=True)
-        return [job.to_dict() for job in jobs[:limit]]
+            jobs, next_cursor = self._jobs.page(
+                limit, cursor=position, statuses=statuses, model=model, match_model=model is not None
+            )
+        return {
+            "items": self._render(jobs, view, fields),
+            "nextCursor": str(next_cursor) if next_cursor else None,
+        }
 
-    def get_job(self, job_id: str) -> Dict[str, Any]:
+    def list_etag(self, *query: Any) -> str:
+        """Weak validator for a listing: changes whenever any job changes."""
+        digest = hashlib.sha1(repr((self._instance, self._version) + query).encode("utf-8")).hexdigest()[:16]
+        return f'W/"{digest}"'
+
+    def get_job(self, job_id: str, view: str = "full", fields: Optional[List[str]] = None) -> Dict[str, Any]:
         job = self._get_job(job_id)
+        if not job and self._store:
+            # Evicted from memory by retention but still journaled.
+            row = self._store.load_job(job_id)
+            if row:
+                return JobRecord.from_row(row).project(view, fields)
         if not job:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
-        return job.to_dict()
+        return self._render([job], view, fields)[0]
+
+    def pin_job(self, job_id: str, pinned: bool) -> Dict[str, Any]:
+        entry = self.runs.set_pinned(job_id, pinned)
+        job = self._get_job(job_id)
+        if job is not None:
+            with self._lock:
+                job.pinned = pinned
+            if self._store:
+                self._store.save(job.to_row())
+            self._publish(job)
+            return self._render([job])[0]
+        stored = self._load_stored(job_id)
+        if stored is not None:
+            stored.pinned = pinned
+            self._store.save(stored.to_row())
+            return stored.to_dict()
+        if entry is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+        # Immediate runs are only known to the runs manifest.
+        return {"id": job_id, "pinned": entry.pinned}
 
     def cancel_job(self, job_id: str) -> Dict[str, Any]:
         job = self._get_job(job_id)
         if not job:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+            # Only finished jobs are ever evicted, so there is nothing left to cancel.
+            return self.get_job(job_id)
+        self._cancel([job])
+        return self._render([job])[0]
+
+    def cancel_jobs(
+        self,
+        client_id: Optional[str] = None,
+        statuses: Optional[Sequence[str]] = None,
+        model: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Cancel every queued or running job matching all of the given filters."""
+        statuses = [item for item in (statuses or ("queued", "running")) if item in ("queued", "running")]
         with self._lock:
-            job.cancel_requested = True
-            if job.status == "queued":
+            jobs = [
+                job
+                for job in self._jobs.with_status(statuses)
+                if (client_id is None or job.client_id == client_id) and (model is None or job.model == model)
+            ]
+        cancelled = self._cancel(jobs)
+        return {"cancelled": len(cancelled), "ids": [job.id for job in cancelled]}
+
+    def _cancel(self, jobs: Sequence[JobRecord]) -> List[JobRecord]:
+        """Finish queued and running jobs as cancelled, interrupting batches nobody still needs."""
+        cancelled: List[JobRecord] = []
+        interrupts: Dict[str, Backend] = {}
+        with self._lock:
+            for job in jobs:
+                if job.status not in ("queued", "running"):
+                    continue
+                job.cancel_requested = True
                 job.status = "error"
                 job.error = "Cancelled"
                 job.progress = 100
+                job.eta_seconds = None
                 job.completed_at = datetime.utcnow()
-        return job.to_dict()
+                cancelled.append(job)
+            for job in cancelled:
+                batch = self._inflight.get(job.id) if job.id in self._generating else None
+                backend = self._backends.get(job.backend) if batch else None
+                if backend is None or backend.name in interrupts:
+                    continue
+                # Coalesced jobs share one request; only stop it once all of them are cancelled.
+                members = [self._jobs.get(item) for item in batch]
+                if all(member is None or member.cancel_requested for member in members):
+                    interrupts[backend.name] = backend
+        # Queued jobs leave the scheduler now rather than being skipped at dispatch time.
+        for job in cancelled:
+            self._scheduler.remove(job.id)
+            self._affinity.forget(job.id)
+        for backend in interrupts.values():
+            if backend.running > 1:
+                # SD.Next runs one request at a time; with several in flight the running one is unknown.
+                continue
+            try:
+                sdnext.interrupt(backend.base_url)
+            except HTTPException as exc:
+                logger.warning("Unable to interrupt backend %s: %s", backend.name, exc.detail)
+        for job in cancelled:
+            self._transition(job)
+            self._abandon_flight(job)
+        return cancelled
 
-    # Worker ----------------------------------------------------------------------
-    def _worker_loop(self) -> None:
+    def set_priority(self, job_id: str, priority: int) -> Dict[str, Any]:
+        """Move a still-queued job within the scheduler."""
+        job = self._get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+        priority = self._scheduler.clamp(priority)
+        with self._lock:
+            if job.status != "queued":
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Only queued jobs can be reordered")
+            job.priority = priority
+        self._scheduler.reprioritize(job.id, priority)
+        if self._store:
+            self._store.save(job.to_row())
+        self._publish(job)
+        return self._render([job])[0]
+
+    def active_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = self._jobs.with_status(("queued", "running"))
+        return self._render(jobs)
+
+    def scheduler_stats(self) -> Dict[str, Any]:
+        return {**self._scheduler.stats(), "affinity": self._affinity.stats(), "eta": self._eta.stats()}
+
+    def backend_status(self) -> List[Dict[str, Any]]:
+        return self._backends.status()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    def output_path(self, job_id: str) -> Optional[Path]:
+        """Location of a job's image under ``runs/``, including immediate (unqueued) runs."""
+        if not job_id.isalnum():
+            return None
+        indexed = self.runs.resolve(job_id)
+        if indexed is not None and indexed.is_file():
+            self.runs.touch(job_id)
+            return indexed
+        job = self._get_job(job_id)
+        image_url = job.image_url if job else None
+        if image_url is None and self._store:
+            row = self._store.load_job(job_id)
+            image_url = row.get("image_url") if row else None
+        if image_url:
+            candidates = [self._runs_dir / image_url.rsplit("/", 1)[-1]]
+        else:
+            candidates = sorted(self._runs_dir.glob(f"{job_id}.*"))
+        return next((path for path in candidates if path.suffix != ".json" and path.is_file()), None)
+
+    # Retention -------------------------------------------------------------------
+    def _retention_loop(self) -> None:
         while True:
-            job_id = self._queue.get()
+            self._retention_wakeup.wait(self._retention.sweep_interval)
+            self._retention_wakeup.clear()
+            self._sweep()
+
+    def _sweep(self) -> List[str]:
+        with self._lock:
+            finished = [
+                (job.id, job.completed_at or job.created_at)
+                for job in self._jobs.values()
+                if job.status in TERMINAL_STATUSES
+            ]
+            total = len(self._jobs)
+        evicted = select_evictions(finished, total, self._retention, datetime.utcnow())
+        if evicted:
+            with self._lock:
+                self._jobs.remove(evicted)
+            self._version = next(self._versions)
+            if self._store and self._retention.purge_store:
+                self._store.delete(evicted)
+        return evicted
+
+    def _on_runs_collected(self, entries: List[RunEntry]) -> None:
+        """Point jobs whose output the garbage collector deleted at the ``expired`` status."""
+        job_ids = [entry.id for entry in entries]
+        self.thumbnails.discard(job_ids)
+        reason = "Output removed to free disk space"
+        for job_id in job_ids:
             job = self._get_job(job_id)
-            if not job:
-                self._queue.task_done()
+            if job is not None:
+                with self._lock:
+                    job.status = "expired"
+                    job.image_url = None
+                    job.error = reason
+                self._transition(job)
                 continue
+            stored = self._load_stored(job_id)
+            if stored is not None:
+                stored.status = "expired"
+                stored.image_url = None
+                stored.error = reason
+                self._store.save(stored.to_row())
+
+    # Worker ----------------------------------------------------------------------
+    def _dispatch_loop(self) -> None:
+        while True:
+            # Take a worker slot first so the scheduler decides as late as possible.
+            backend = self._backends.acquire()
+            job = self._next_dispatchable(backend)
+            batch = [job] + self._collect_batch(job)
+            with self._lock:
+                for item in batch:
+                    item.backend = backend.name
+            for item in batch:
+                self._transition(item)
+            self._backend_queues[backend.name].put([item.id for item in batch])
+
+    def _next_dispatchable(self, backend: Backend) -> JobRecord:
+        choose = None
+        if self._affinity.enabled:
+            # Ask SD.Next now if needed (not under the scheduler lock), but decide on whatever is
+            # loaded when a job is actually popped: the warmer may preload another checkpoint
+            # while this waits for work.
+            self._loaded_model(backend)
+
+            def choose(ordered: List[str]) -> Optional[str]:
+                return self._affinity.choose(ordered, backend.loaded_model, self._job_model, self._job_waited)
+
+        while True:
+            job_id = self._scheduler.pop(choose=choose, lookahead=self._affinity.lookahead)
+            self._affinity.forget(job_id)
+            job = self._get_job(job_id)
+            if job and not (job.cancel_requested and job.status == "error"):
+                return job
+
+    def _job_model(self, job_id: str) -> Optional[str]:
+        job = self._get_job(job_id)
+        return job.model if job else None
 
-            if job.cancel_requested and job.status == "error":
-                self._queue.task_done()
+    def _job_waited(self, job_id: str) -> float:
+        job = self._get_job(job_id)
+        return (datetime.utcnow() - job.created_at).total_seconds() if job else 0.0
+
+    # Admission and ETA -----------------------------------------------------------
+    def _admit(self, client_id: Optional[str]) -> None:
+        """Refuse new work with 429 once the queue or the client's share of it is full."""
+        rejected = check_admission(self._admission, len(self._scheduler), self._scheduler.queued_for(client_id))
+        if rejected is None:
+            return
+        limit, excess = rejected
+        live, order = self._projection()
+        if limit == "client":
+            ahead = [job_id for job_id, client in order if client == client_id]
+            detail = "Too many queued jobs for this client"
+        else:
+            ahead = [job_id for job_id, _ in order]
+            detail = "The job queue is full"
+        # Room opens up once ``excess`` of the queued jobs have started.
+        ahead = ahead[:excess]
+        start = live.get(ahead[-1], {}).get("estimatedStart") if ahead else None
+        wait = (_parse_dt(start) - datetime.utcnow()).total_seconds() if start else 0.0
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(retry_after(self._admission, wait))},
+        )
+
+    def _live_fields(self, max_age: float = 0.0) -> Dict[str, Dict[str, Any]]:
+        return self._projection(max_age)[0]
+
+    def _projection(self, max_age: float = 0.0) -> _Projection:
+        """Queue position plus projected start and finish of every queued or running job.
+
+        Running jobs occupy their backend until their estimated finish; queued jobs then go,
+        in dispatch order, to whichever backend frees up first, paying that backend's average
+        swap time when they need a different checkpoint. Jobs without a ``model`` run on
+        whatever their backend has loaded. Also returns ``(job id, client)`` of the queued jobs
+        in dispatch order. Recomputed when the queue or the set of running jobs changes, and at
+        most once a second otherwise; with ``max_age`` a projection that recent is reused even
+        if the queue has changed since.
+        """
+        with self._lock:
+            running = self._jobs.with_status(("running",))
+        key = (self._scheduler.version, tuple(job.id for job in running), int(time.monotonic()))
+        cached_key, computed_at, cached = self._live_cache
+        if cached_key == key or time.monotonic() - computed_at < max_age:
+            return cached
+        now = datetime.utcnow()
+        backends = [backend for backend in self._backends.backends if backend.healthy] or self._backends.backends
+        lanes: Dict[str, Tuple[datetime, Optional[str]]] = {
+            backend.name: (now, backend.loaded_model) for backend in backends
+        }
+        swap_cost = {
+            backend.name: backend.swap_seconds / backend.swaps if backend.swaps else 0.0 for backend in backends
+        }
+        live: Dict[str, Dict[str, Any]] = {}
+        order: List[Tuple[str, Optional[str]]] = []
+        for job in running:
+            started = job.started_at or now
+            free_at, model = lanes.get(job.backend or "", (now, None))
+            model = job.model or model
+            finish = max(now, started + timedelta(seconds=self._eta.estimate(model, job.payload)))
+            if job.backend in lanes:
+                lanes[job.backend] = (max(free_at, finish), model)
+            live[job.id] = {"estimatedStart": _iso(started), "estimatedFinish": _iso(finish)}
+        for position, job_id in enumerate(self._scheduler.ordered(), 1):
+            job = self._get_job(job_id)
+            if job is None:
                 continue
+            name = min(lanes, key=lambda lane: lanes[lane][0])
+            start, model = lanes[name]
+            if job.model and not sdnext.model_matches(model, job.model):
+                start += timedelta(seconds=swap_cost[name])
+            model = job.model or model
+            finish = start + timedelta(seconds=self._eta.estimate(model, job.payload))
+            lanes[name] = (finish, model)
+            live[job_id] = {"position": position, "estimatedStart": _iso(start), "estimatedFinish": _iso(finish)}
+            order.append((job_id, job.client_id))
+        self._live_cache = (key, time.monotonic(), (live, order))
+        return live, order
+
+    # Checkpoint affinity ---------------------------------------------------------
+    def _loaded_model(self, backend: Backend) -> Optional[str]:
+        """Checkpoint the backend has loaded, asking SD.Next when it is not known yet."""
+        if backend.loaded_model is not None:
+            return backend.loaded_model
+        checked = backend.model_checked_at
+        if checked is not None and time.monotonic() - checked < _MODEL_RECHECK_SECONDS:
+            return None
+        try:
+            loaded = sdnext.active_checkpoint(backend.base_url)
+        except HTTPException:
+            loaded = None
+        self._backends.set_loaded_model(backend, loaded)
+        return loaded
+
+    def _ensure_model(self, backend: Backend, model: Optional[str]) -> None:
+        """Switch the backend to ``model`` up front so the swap is timed and counted.
+
+        The job's ``override_settings`` then names the checkpoint that is already loaded,
+        so SD.Next neither reloads it for the request nor swaps back afterwards.
+        """
+        if not model:
+            return
+        loaded = self._loaded_model(backend)
+        if loaded is None or sdnext.model_matches(loaded, model):
+            return
+        self._switch_model(backend, model, loaded)
+
+    def _preload_model(self, backend: Backend, model: str) -> bool:
+        """Load ``model`` for the warmer, even if the current checkpoint is unknown."""
+        loaded = self._loaded_model(backend)
+        if sdnext.model_matches(loaded, model):
+            return False
+        self._switch_model(backend, model, loaded)
+        return True
+
+    def _predict_model(self, backend: Backend) -> Optional[str]:
+        """The checkpoint ``backend`` is most likely to need next that no other backend holds.
+
+        Queued jobs are considered in dispatch order, then the most requested models among
+        recent submissions.
+        """
+        others = [
+            other.loaded_model for other in self._backends.backends if other is not backend and other.loaded_model
+        ]
+        queued = [self._job_model(job_id) for job_id in self._scheduler.ordered(self._affinity.lookahead)]
+        recent = [model for model, _ in Counter(self._recent_models).most_common()]
+        for model in itertools.chain(queued, recent):
+            if model and not any(sdnext.model_matches(loaded, model) for loaded in others):
+                return model
+        return None
+
+    def _default_model(self) -> Optional[str]:
+        settings = self._settings_loader()
+        model = settings.get("model") if isinstance(settings, Mapping) else None
+        return model.get("name") if isinstance(model, Mapping) else None
+
+    def _switch_model(self, backend: Backend, model: str, loaded: Optional[str]) -> None:
+        started = time.monotonic()
+        try:
+            sdnext.load_checkpoint(model, backend.base_url)
+        except HTTPException:
+            # Whatever is loaded now is unknown; the job's override settings still name its model.
+            self._backends.set_loaded_model(backend, None)
+            raise
+        elapsed = time.monotonic() - started
+        self._backends.record_swap(backend, model, elapsed)
+        logger.info("Backend %s swapped %s -> %s in %.1fs", backend.name, loaded, model, elapsed)
+
+    def _collect_batch(self, first: JobRecord) -> List[JobRecord]:
+        """Pull queued jobs that can share ``first``'s backend request, waiting at most one window."""
+        config = self._coalesce
+        if not config.enabled or config.max_batch <= 1:
+            return []
+
+        payloads = [first.payload]
+        batch: List[JobRecord] = []
+        scanned = 0
 
+        seen = set()
+
+        def scan() -> None:
+            nonlocal scanned
+            for job_id in self._scheduler.ordered(config.scan_limit):
+                if len(payloads) >= config.max_batch or scanned >= config.scan_limit:
+                    return
+                if job_id in seen:
+                    continue
+                seen.add(job_id)
+                scanned += 1
+                job = self._get_job(job_id)
+                if job and can_join(payloads, job.payload) and self._scheduler.remove(job_id):
+                    self._affinity.forget(job_id)
+                    payloads.append(job.payload)
+                    batch.append(job)
+
+        version = self._scheduler.version
+        scan()
+        deadline = time.monotonic() + config.window
+        while len(payloads) < config.max_batch and scanned < config.scan_limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            changed = self._scheduler.wait(version, remaining)
+            if changed != version:
+                version = changed
+                scan()
+        return batch
+
+    def _worker_loop(self, backend: Backend, batches: "queue.Queue[List[str]]") -> None:
+        while True:
+            job_ids = batches.get()
+            ok = True
+            try:
+                jobs = [job for job in map(self._get_job, job_ids) if job]
+                jobs = [job for job in jobs if not (job.cancel_requested and job.status == "error")]
+                if len(jobs) < len(job_ids):
+                    # A job cancelled while queued leaves a gap in the seeds; each run must stay contiguous.
+                    runs = [[jobs[index] for index in run] for run in split_runs([job.payload for job in jobs])]
+                else:
+                    runs = [jobs] if jobs else []
+                for run in runs:
+                    self._backends.begin_work(backend)
+                    try:
+                        ok = self._run_batch(backend, run) and ok
+                    finally:
+                        self._backends.end_work(backend)
+            finally:
+                self._backends.release(backend, ok)
+                batches.task_done()
+
+    def _run_batch(self, backend: Backend, jobs: List[JobRecord]) -> bool:
+        batch_ids = [job.id for job in jobs]
+        # Registered before the jobs show as running, so a cancel always sees its batch.
+        with self._lock:
+            for job_id in batch_ids:
+                self._inflight[job_id] = batch_ids
+        for job in jobs:
             self._mark_running(job)
+        stop_watch = threading.Event()
+        watcher = threading.Thread(
+            target=self._watch_progress,
+            args=(jobs, backend, stop_watch),
+            name=f"codex-job-progress-{jobs[0].id}",
+            daemon=True,
+        )
+        watcher.start()
+        paths = [self._temp_dir / f"{job.id}.png" for job in jobs]
+        try:
             try:
-                image_bytes, meta = sdnext.txt2img(job.payload)
+                self._ensure_model(backend, jobs[0].model)
+                with self._lock:
+                    # Cancelled during the swap: SD.Next would clear an interrupt sent while it
+                    # was loading weights, so do not start the request at all.
+                    abandoned = all(job.cancel_requested for job in jobs)
+                    if not abandoned:
+                        self._generating.update(batch_ids)
+                if abandoned:
+                    return True
+                if len(jobs) == 1:
+                    params = jobs[0].payload
+                else:
+                    params = batch_params([job.payload for job in jobs])
+                units = sum(self._eta.units(job.payload) for job in jobs)
+                started = time.monotonic()
+                meta = sdnext.txt2img_to_files(params, paths, backend.base_url)
+                if not any(job.cancel_requested for job in jobs):
+                    # Interrupted batches would skew the rate, so only complete ones are learned from.
+                    self._eta.observe(jobs[0].model or backend.loaded_model, units, time.monotonic() - started)
+            finally:
+                stop_watch.set()
+                with self._lock:
+                    for job_id in batch_ids:
+                        self._inflight.pop(job_id, None)
+                        self._generating.discard(job_id)
+            for index, (job, temp_path) in enumerate(zip(jobs, paths)):
                 self._mark_progress(job, 85)
                 if job.cancel_requested:
+                    temp_path.unlink(missing_ok=True)
                     self._mark_cancelled(job)
                 else:
-                    self._finalize_success(job, image_bytes, meta)
-            except HTTPException as exc:
-                self._finalize_error(job, str(exc.detail if hasattr(exc, "detail") else exc))
-            except Exception as exc:  # pragma: no cover - defensive guard
-                self._finalize_error(job, str(exc))
-            finally:
-                self._queue.task_done()
+                    job_meta = sdnext.batch_meta(meta, index, len(jobs)) if len(jobs) > 1 else meta
+                    self._publish_output(job, temp_path, job_meta)
+            # The writer pool finishes the jobs; this backend can take the next batch now.
+            return True
+        except HTTPException as exc:
+            if all(job.cancel_requested for job in jobs):
+                # An interrupted request may fail on the SD.Next side; the jobs are already cancelled.
+                return True
+            if is_unreachable(exc):
+                self._backends.mark_unhealthy(backend, str(exc.detail))
+            for job in jobs:
+                if job.status not in ("done", "error"):
+                    self._finalize_error(job, str(exc.detail if hasattr(exc, "detail") else exc))
+        except Exception as exc:  # pragma: no cover - defensive guard
+            for job in jobs:
+                if job.status not in ("done", "error"):
+                    self._finalize_error(job, str(exc))
+        return False
+
+    def _watch_progress(self, jobs: List[JobRecord], backend: Backend, stop: threading.Event) -> None:
+        while not stop.wait(self._progress_interval):
+            try:
+                state = sdnext.progress(backend.base_url)
+            except HTTPException:
+                continue
+            if stop.is_set():
+                return
+            if state["steps"] <= 0 and state["progress"] <= 0:
+                continue
+            changed = []
+            with self._lock:
+                for job in jobs:
+                    if job.status != "running":
+                        continue
+                    before = (job.progress, job.step, job.total_steps, job.eta_seconds)
+                    job.progress = max(job.progress, min(95, 10 + int(state["progress"] * 80)))
+                    job.step = state["step"] or job.step
+                    job.total_steps = state["steps"] or job.total_steps
+                    job.eta_seconds = state["eta"]
+                    if before != (job.progress, job.step, job.total_steps, job.eta_seconds):
+                        changed.append(job)
+            for job in changed:
+                self._publish(job)
+
+    # Result cache ----------------------------------------------------------------
+    def _submit(self, job: JobRecord) -> None:
+        if job.cache_key:
+            entry, leader = self._cache.claim(job.cache_key, job.id)
+            if entry:
+                meta, source_job = self._cache.read_meta(entry)
+                self._finalize_cached(job, entry.path, meta, source_job)
+                return
+            if not leader:
+                # An identical job is already in flight; this one completes alongside it.
+                self._publish(job)
+                return
+        self._scheduler.push(job.id, job.client_id, job.priority, job.seq)
+        self._publish(job)
+
+    def _abandon_flight(self, job: JobRecord) -> None:
+        """Resubmit followers when their leader leaves without producing an image."""
+        if not job.cache_key:
+            return
+        for follower_id in self._cache.release(job.cache_key, job.id):
+            follower = self._get_job(follower_id)
+            if follower and follower.status == "queued":
+                self._submit(follower)
+
+    def _finalize_cached(self, job: JobRecord, source: Path, meta: Dict[str, Any], source_job: str) -> None:
+        image_path = self.runs.path_for(job.id, job.created_at, source.suffix)
+        try:
+            link_or_copy(source, image_path)
+            self._record_output(job.id, image_path, job.model, job.prompt, job.pinned)
+        except OSError as exc:
+            self._finalize_error(job, f"Unable to reuse cached image: {exc}")
+            return
+        payload_meta = dict(meta)
+        payload_meta["cached"] = True
+        payload_meta["cachedFrom"] = source_job
+        with self._lock:
+            job.status = "done"
+            job.progress = 100
+            job.image_url = f"/runs/{image_path.name}"
+            job.meta = payload_meta
+            job.eta_seconds = None
+            job.started_at = job.started_at or datetime.utcnow()
+            job.completed_at = datetime.utcnow()
+        self._transition(job)
+        self.thumbnails.pregenerate(job.id, image_path)
+
+    def _settle_followers(self, job: JobRecord, image_path: Path, meta: Dict[str, Any]) -> None:
+        if not job.cache_key:
+            return
+        entry, followers = self._cache.complete(job.cache_key, job.id, image_path, meta)
+        source = entry.path if entry else image_path
+        for follower_id in followers:
+            follower = self._get_job(follower_id)
+            if follower and follower.status == "queued":
+                self._finalize_cached(follower, source, meta, job.id)
 
     # Internal helpers ------------------------------------------------------------
+    def _publish(self, job: JobRecord) -> None:
+        self._version = next(self._versions)
+        job.rev += 1
+        # Precompute the summary here so polling readers only serialize a cached dict.
+        job.summary()
+        if not self.events.subscriber_count:
+            # Nobody is listening; readers project live fields on demand.
+            return
+        # Events fire on every submission and progress tick; share one projection per interval.
+        live = self._live_fields(_EVENT_LIVE_MAX_AGE).get(job.id) if job.status in ("queued", "running") else None
+        self.events.publish(job.to_dict(live=live))
+
+    def _transition(self, job: JobRecord) -> None:
+        """Journal a state change, notify subscribers, then drop heavy fields of finished jobs."""
+        finished = job.status in TERMINAL_STATUSES
+        with self._lock:
+            self._jobs.update(job)
+        if self._store:
+            self._store.save(job.to_row(details=finished))
+        self._publish(job)
+        if self._store and finished and not job.archived:
+            with self._lock:
+                job.archived = True
+                job.payload = None
+                job.settings_snapshot = None
+                job.meta = None
+
+    def _render(
+        self, jobs: List[JobRecord], view: str = "full", fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        needs_detail = any(name in DETAIL_FIELDS for name in fields) if fields else view == "full"
+        archived = [job.id for job in jobs if job.archived] if needs_detail else []
+        details = self._store.load_details(archived) if self._store and archived else {}
+        live = self._live_fields() if any(job.status in ("queued", "running") for job in jobs) else {}
+        return [job.project(view, fields, details.get(job.id), live.get(job.id)) for job in jobs]
+
     def _get_job(self, job_id: str) -> Optional[JobRecord]:
         with self._lock:
             return self._jobs.get(job_id)
 
+    def _load_stored(self, job_id: str) -> Optional[JobRecord]:
+        """A job evicted from memory by retention, read back from the journal."""
+        row = self._store.load_job(job_id) if self._store else None
+        return JobRecord.from_row(row) if row else None
+
     def _mark_running(self, job: JobRecord) -> None:
         with self._lock:
             if job.status != "queued":
@@ -150,59 +1114,149 @@ class JobQueue:
             job.status = "running"
             job.started_at = datetime.utcnow()
             job.progress = 10
+        self._transition(job)
 
     def _mark_progress(self, job: JobRecord, value: int) -> None:
         with self._lock:
             if job.status == "running":
                 job.progress = max(job.progress, min(95, value))
+        self._publish(job)
 
     def _mark_cancelled(self, job: JobRecord) -> None:
         with self._lock:
+            if job.status in TERMINAL_STATUSES:
+                # Already finished by cancel_job.
+                return
             job.status = "error"
             job.error = "Cancelled"
             job.progress = 100
+            job.eta_seconds = None
             job.completed_at = datetime.utcnow()
+        self._transition(job)
+        self._abandon_flight(job)
+
+    def _publish_output(self, job: JobRecord, temp_path: Path, meta: Optional[Dict[str, Any]]) -> None:
+        future = self._writer.publish(
+            temp_path,
+            self.runs.path_for(job.id, job.created_at, temp_path.suffix),
+            output_format(job.settings_snapshot),
+            meta,
+        )
 
-    def _finalize_success(self, job: JobRecord, image_bytes: bytes, meta: Optional[Dict[str, Any]]) -> None:
-        image_path = self._runs_dir / f"{job.id}.png"
-        image_path.write_bytes(image_bytes)
+        def published(done: "Future[PublishedOutput]") -> None:
+            error = done.exception()
+            if error is not None:
+                self._finalize_error(job, f"Failed to write output: {error}")
+                return
+            output = done.result()
+            if job.cancel_requested:
+                # Never indexed, so the manifest does not count bytes of a file that is gone.
+                output.path.unlink(missing_ok=True)
+                self._mark_cancelled(job)
+                return
+            try:
+                self._record_output(job.id, output.path, job.model, job.prompt, job.pinned)
+            except OSError as exc:
+                self._finalize_error(job, f"Failed to index output: {exc}")
+                return
+            if isinstance(meta, dict):
+                meta["output"] = output.to_meta()
+            self._finalize_success(job, output.path, meta)
+
+        future.add_done_callback(published)
+
+    def _record_output(
+        self, job_id: str, path: Path, model: Optional[str], prompt: Optional[str], pinned: bool = False
+    ) -> None:
+        self.runs.record(job_id, path, model, prompt, pinned)
+        if self.runs_gc.over_quota():
+            self.runs_gc.wake()
+
+    def _finalize_success(self, job: JobRecord, image_path: Path, meta: Optional[Dict[str, Any]]) -> None:
         payload_meta: Dict[str, Any] = meta or {}
         if isinstance(payload_meta, dict):
             payload_meta.setdefault("codex_settings", job.settings_snapshot)
         with self._lock:
             job.status = "done"
             job.progress = 100
-            job.image_url = f"/runs/{job.id}.png"
+            job.image_url = f"/runs/{image_path.name}"
             job.meta = payload_meta
+            job.eta_seconds = None
             job.completed_at = datetime.utcnow()
+        self._transition(job)
+        self.thumbnails.pregenerate(job.id, image_path)
+        self._settle_followers(job, image_path, payload_meta)
 
     def _finalize_error(self, job: JobRecord, error_message: str) -> None:
         with self._lock:
             job.status = "error"
             job.error = error_message
             job.progress = 100
+            job.eta_seconds = None
             job.completed_at = datetime.utcnow()
+        self._transition(job)
+        if job.cache_key:
+            for follower_id in self._cache.release(job.cache_key, job.id):
+                follower = self._get_job(follower_id)
+                if follower and follower.status == "queued":
+                    self._finalize_error(follower, error_message)
 
     # Immediate execution ---------------------------------------------------------
-    def run_sync(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    async def run_async(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         settings_snapshot = self._settings_loader()
         prompt = payload.get("prompt") or ""
         negative_prompt = payload.get("negative_prompt")
         model = payload.get("model")
-
-        image_bytes, meta = sdnext.txt2img(payload)
         job_id = uuid4().hex[:12]
-        image_path = self._runs_dir / f"{job_id}.png"
-        image_path.write_bytes(image_bytes)
-        payload_meta: Dict[str, Any] = meta or {}
-        if isinstance(payload_meta, dict):
-            payload_meta.setdefault("codex_settings", settings_snapshot)
-        return {
+        result = {
             "id": job_id,
             "prompt": prompt,
             "negativePrompt": negative_prompt,
             "model": model,
-            "image_url": f"/runs/{job_id}.png",
-            "meta": payload_meta,
             "settings": settings_snapshot,
-        }
\ No newline at end of file
+        }
+
+        key = self._cache.key_for(payload, settings_snapshot)
+        entry = self._cache.lookup(key) if key else None
+        if entry:
+            image_path = self.runs.path_for(job_id, None, entry.path.suffix)
+            meta, source_job = await asyncio.to_thread(self._cache.read_meta, entry)
+            await asyncio.to_thread(link_or_copy, entry.path, image_path)
+            self._record_output(job_id, image_path, model, prompt)
+            meta["cached"] = True
+            meta["cachedFrom"] = source_job
+            return {**result, "backend": None, "image_url": f"/runs/{image_path.name}", "meta": meta}
+
+        backend = self._backends.claim()
+        temp_path = self._temp_dir / f"{job_id}.png"
+        ok = False
+        await asyncio.to_thread(self._backends.begin_work, backend)
+        try:
+            await asyncio.to_thread(self._ensure_model, backend, model)
+            meta = await sdnext.txt2img_to_file_async(payload, temp_path, backend.base_url)
+            ok = True
+        except HTTPException as exc:
+            if is_unreachable(exc):
+                self._backends.mark_unhealthy(backend, str(exc.detail))
+            raise
+        finally:
+            self._backends.end_work(backend)
+            self._backends.release(backend, ok)
+        # ``publish`` blocks while the writer queue is full, so it must not run on the event loop.
+        future = await asyncio.to_thread(
+            self._writer.publish,
+            temp_path,
+            self.runs.path_for(job_id, None, ".png"),
+            output_format(settings_snapshot),
+            meta,
+        )
+        output = await asyncio.wrap_future(future)
+        image_path = output.path
+        self._record_output(job_id, image_path, model, prompt)
+        payload_meta: Dict[str, Any] = meta or {}
+        if isinstance(payload_meta, dict):
+            payload_meta.setdefault("codex_settings", settings_snapshot)
+            payload_meta["output"] = output.to_meta()
+        if key:
+            await asyncio.to_thread(self._cache.store, key, image_path, payload_meta, job_id)
+        return {**result, "backend": backend.name, "image_url": f"/runs/{image_path.name}", "meta": payload_meta}
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .coalesce import RANDOM_SEEDS
+from .config import bool_option, float_option, int_option, section
+
+# Settings sections that only affect the UI and never the rendered pixels.
+_IGNORED_SETTINGS = ("ui",)
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    enabled: bool = True
+    max_entries: int = 2000
+    max_bytes: int = 2 * 1024 ** 3
+    ttl_seconds: float = 7 * 24 * 3600.0
+
+
+def load_cache_config() -> CacheConfig:
+    raw = section("result_cache")
+    defaults = CacheConfig()
+    return CacheConfig(
+        enabled=bool_option(raw.get("enabled"), defaults.enabled),
+        max_entries=max(0, int_option(raw.get("max_entries"), defaults.max_entries)),
+        max_bytes=max(0, int_option(raw.get("max_bytes"), defaults.max_bytes)),
+        ttl_seconds=float_option(raw.get("ttl_seconds")) or defaults.ttl_seconds,
+    )
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    path: Path
+    size: int
+    source_job: str
+    created: float
+    last_used: float
+
+    @property
+    def sidecar(self) -> Path:
+        return self.path.with_suffix(".json")
+
+
+@dataclass
+class _Flight:
+    leader: str
+    followers: List[str] = field(default_factory=list)
+
+
+def cache_key(payload: Dict[str, Any], settings: Dict[str, Any]) -> Optional[str]:
+    """Canonical content hash of a deterministic job; ``None`` when the seed is random."""
+    if payload.get("seed") in RANDOM_SEEDS:
+        return None
+    request = {key: value for key, value in payload.items() if value is not None}
+    model = request.get("model") or (settings.get("model") or {}).get("name")
+    relevant = {key: value for key, value in settings.items() if key not in _IGNORED_SETTINGS}
+    canonical = json.dumps(
+        {"request": request, "model": model, "settings": relevant},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def link_or_copy(source: Path, destination: Path) -> None:
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class ResultCache:
+    """Content-addressed store of finished outputs with single-flight for identical jobs."""
+
+    def __init__(self, root: Path, config: CacheConfig):
+        self._root = root
+        self._config = config
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+        if config.enabled:
+            self._root.mkdir(parents=True, exist_ok=True)
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.enabled
+
+    def key_for(self, payload: Dict[str, Any], settings: Dict[str, Any]) -> Optional[str]:
+        return cache_key(payload, settings) if self.enabled else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "inFlight": len(self._flights),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+    # Lookup and storage ----------------------------------------------------------
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._lookup_locked(key)
+
+    def read_meta(self, entry: CacheEntry) -> Tuple[Dict[str, Any], str]:
+        """Return the stored backend ``meta`` and the id of the job that produced it."""
+        try:
+            record = json.loads(entry.sidecar.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}, entry.source_job
+        if not isinstance(record, dict):
+            return {}, entry.source_job
+        meta = record.get("meta")
+        return (meta if isinstance(meta, dict) else {}), str(record.get("job") or entry.source_job)
+
+    def store(self, key: str, image_path: Path, meta: Dict[str, Any], job_id: str) -> Optional[CacheEntry]:
+        if not self.enabled:
+            return None
+        target = self._root / key[:2] / f"{key}{image_path.suffix}"
+        try:
+            link_or_copy(image_path, target)
+            record = {"job": job_id, "meta": meta}
+            target.with_suffix(".json").write_text(json.dumps(record, default=str), encoding="utf-8")
+            size = target.stat().st_size
+        except OSError:
+            return None
+        now = time.time()
+        entry = CacheEntry(key=key, path=target, size=size, source_job=job_id, created=now, last_used=now)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += size
+            evicted = self._evict_locked()
+        self._delete(evicted)
+        return entry
+
+    # Single-flight ---------------------------------------------------------------
+    def claim(self, key: str, job_id: str) -> Tuple[Optional[CacheEntry], bool]:
+        """Return ``(hit, False)``, ``(None, False)`` for a follower, or ``(None, True)`` for a leader."""
+        with self._lock:
+            entry = self._lookup_locked(key)
+            if entry:
+                return entry, False
+            flight = self._flights.get(key)
+            if flight:
+                flight.followers.append(job_id)
+                return None, False
+            self._flights[key] = _Flight(leader=job_id)
+            return None, True
+
+    def complete(
+        self, key: str, job_id: str, image_path: Path, meta: Dict[str, Any]
+    ) -> Tuple[Optional[CacheEntry], List[str]]:
+        entry = self.store(key, image_path, meta, job_id)
+        return entry, self._land(key, job_id)
+
+    def release(self, key: str, job_id: str) -> List[str]:
+        """Drop ``job_id`` from its flight; a departing leader hands back its followers."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if not flight:
+                return []
+            if flight.leader != job_id:
+                if job_id in flight.followers:
+                    flight.followers.remove(job_id)
+                return []
+        return self._land(key, job_id)
+
+    def _land(self, key: str, job_id: str) -> List[str]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if not flight or flight.leader != job_id:
+                return []
+            del self._flights[key]
+            return flight.followers
+
+    # Internal helpers ------------------------------------------------------------
+    def _lookup_locked(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry and (now - entry.created > self._config.ttl_seconds or not entry.path.exists()):
+            self._entries.pop(key)
+            self._bytes -= entry.size
+            self._delete([entry])
+            entry = None
+        if not entry:
+            self._misses += 1
+            return None
+        entry.last_used = now
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry
+
+    def _evict_locked(self) -> List[CacheEntry]:
+        evicted: List[CacheEntry] = []
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if now - entry.created > self._config.ttl_seconds]:
+            evicted.append(self._entries.pop(key))
+        while self._entries and (
+            len(self._entries) > self._config.max_entries
+            or self._bytes - sum(entry.size for entry in evicted) > self._config.max_bytes
+        ):
+            _, entry = self._entries.popitem(last=False)
+            evicted.append(entry)
+        self._bytes -= sum(entry.size for entry in evicted)
+        return evicted
+
+    def _delete(self, entries: List[CacheEntry]) -> None:
+        for entry in entries:
+            for path in (entry.path, entry.sidecar):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _load(self) -> None:
+        found: List[CacheEntry] = []
+        for sidecar in self._root.glob("*/*.json"):
+            image = next((item for item in sidecar.parent.glob(f"{sidecar.stem}.*") if item != sidecar), None)
+            if image is None:
+                continue
+            try:
+                stat = image.stat()
+            except OSError:
+                continue
+            found.append(
+                CacheEntry(
+                    key=sidecar.stem,
+                    path=image,
+                    size=stat.st_size,
+                    source_job="",
+                    created=stat.st_mtime,
+                    last_used=stat.st_atime,
+                )
+            )
+        found.sort(key=lambda entry: entry.last_used)
+        with self._lock:
+            for entry in found:
+                self._entries[entry.key] = entry
+                self._bytes += entry.size
+            evicted = self._evict_locked()
+        self._delete(evicted)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import bool_option, float_option, int_option, section
+
+
+@dataclass(frozen=True)
+class RetentionConfig:
+    max_jobs: int = 5000
+    ttl_seconds: float = 7 * 24 * 3600.0
+    sweep_interval: float = 60.0
+    purge_store: bool = False
+
+
+def load_retention_config() -> RetentionConfig:
+    raw = section("retention")
+    defaults = RetentionConfig()
+    return RetentionConfig(
+        max_jobs=max(1, int_option(raw.get("max_jobs"), defaults.max_jobs)),
+        ttl_seconds=float_option(raw.get("ttl_seconds")) or defaults.ttl_seconds,
+        sweep_interval=float_option(raw.get("sweep_interval")) or defaults.sweep_interval,
+        purge_store=bool_option(raw.get("purge_store"), defaults.purge_store),
+    )
+
+
+def select_evictions(
+    finished: Iterable[Tuple[str, datetime]], total: int, config: RetentionConfig, now: datetime
+) -> List[str]:
+    """Pick finished jobs to forget: everything past the TTL, then the oldest until under ``max_jobs``."""
+    ordered = sorted(finished, key=lambda item: item[1])
+    cutoff = now - timedelta(seconds=config.ttl_seconds)
+    evicted = [job_id for job_id, completed_at in ordered if completed_at < cutoff]
+    excess = total - len(evicted) - config.max_jobs
+    if excess > 0:
+        evicted.extend(job_id for job_id, _ in ordered[len(evicted) : len(evicted) + excess])
+    return evicted
+
+
+class SnapshotInterner:
+    """Share one settings snapshot object between all jobs created under identical settings."""
+
+    def __init__(self, capacity: int = 256):
+        self._capacity = capacity
+        self._snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # (object last passed in, object handed back); keeping the reference makes ``is`` safe.
+        self._last: Optional[Tuple[Dict[str, Any], Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def intern(self, snapshot: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if snapshot is None:
+            return None
+        last = self._last
+        if last is not None and last[0] is snapshot:
+            # The settings store hands out one object per version; skip re-hashing it.
+            return last[1]
+        digest = hashlib.sha1(
+            json.dumps(snapshot, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+        ).hexdigest()
+        with self._lock:
+            shared = self._snapshots.get(digest)
+            if shared is not None:
+                self._snapshots.move_to_end(digest)
+                self._last = (snapshot, shared)
+                return shared
+            self._snapshots[digest] = snapshot
+            self._last = (snapshot, snapshot)
+            if len(self._snapshots) > self._capacity:
+                self._snapshots.popitem(last=False)
+            return snapshot
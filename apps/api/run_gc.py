@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .config import bool_option, float_option, int_option, section
+from .run_storage import RunEntry, RunStorage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RunGCConfig:
+    enabled: bool = True
+    max_bytes: int = 50 * 1024 ** 3
+    max_files: int = 0
+    max_age_seconds: float = 0.0
+    # Outputs younger than this are never collected, so a client can still fetch a fresh image.
+    min_age_seconds: float = 300.0
+    # Collect down to this fraction of the quota so every new output does not trigger a pass.
+    low_water: float = 0.9
+    interval: float = 300.0
+
+
+def load_run_gc_config() -> RunGCConfig:
+    raw = section("run_gc")
+    defaults = RunGCConfig()
+    low_water = float_option(raw.get("low_water"))
+    max_age = float_option(raw.get("max_age_seconds"))
+    min_age = float_option(raw.get("min_age_seconds"))
+    return RunGCConfig(
+        enabled=bool_option(raw.get("enabled"), defaults.enabled),
+        max_bytes=max(0, int_option(raw.get("max_bytes"), defaults.max_bytes)),
+        max_files=max(0, int_option(raw.get("max_files"), defaults.max_files)),
+        max_age_seconds=max(0.0, max_age) if max_age is not None else defaults.max_age_seconds,
+        min_age_seconds=max(0.0, min_age) if min_age is not None else defaults.min_age_seconds,
+        low_water=min(1.0, max(0.1, low_water)) if low_water else defaults.low_water,
+        interval=float_option(raw.get("interval_seconds")) or defaults.interval,
+    )
+
+
+def select_run_evictions(entries: Iterable[RunEntry], config: RunGCConfig, now: float) -> List[RunEntry]:
+    """Pick outputs to delete: unpinned ones past ``max_age``, then least recently used until under quota."""
+    entries = list(entries)
+    total_bytes = sum(entry.size for entry in entries)
+    total_files = len(entries)
+    young = now - config.min_age_seconds
+    candidates = sorted(
+        (entry for entry in entries if not entry.pinned and entry.created < young),
+        key=lambda entry: entry.accessed or entry.created,
+    )
+    evicted: List[RunEntry] = []
+    if config.max_age_seconds:
+        cutoff = now - config.max_age_seconds
+        evicted = [entry for entry in candidates if entry.created < cutoff]
+        candidates = [entry for entry in candidates if entry.created >= cutoff]
+    total_bytes -= sum(entry.size for entry in evicted)
+    total_files -= len(evicted)
+    over_bytes = config.max_bytes and total_bytes > config.max_bytes
+    over_files = config.max_files and total_files > config.max_files
+    if not (over_bytes or over_files):
+        return evicted
+    target_bytes = config.max_bytes * config.low_water if config.max_bytes else float("inf")
+    target_files = config.max_files * config.low_water if config.max_files else float("inf")
+    for entry in candidates:
+        if total_bytes <= target_bytes and total_files <= target_files:
+            break
+        evicted.append(entry)
+        total_bytes -= entry.size
+        total_files -= 1
+    return evicted
+
+
+class RunCollector:
+    """Background thread that keeps ``runs/`` under its disk quota.
+
+    Files are deleted first, then dropped from the manifest, then ``on_evicted`` lets the
+    job queue update the affected jobs. Pinned outputs are never touched.
+    """
+
+    def __init__(
+        self,
+        storage: RunStorage,
+        config: RunGCConfig,
+        on_evicted: Callable[[List[RunEntry]], None],
+    ):
+        self._storage = storage
+        self._config = config
+        self._on_evicted = on_evicted
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._evicted_files = 0
+        self._evicted_bytes = 0
+        self._last_run: Optional[float] = None
+        self._last_evicted = 0
+        self._thread: Optional[threading.Thread] = None
+        if config.enabled:
+            self._thread = threading.Thread(target=self._loop, name="codex-runs-gc", daemon=True)
+            self._thread.start()
+
+    def over_quota(self) -> bool:
+        config = self._config
+        return bool(
+            (config.max_bytes and self._storage.total_bytes > config.max_bytes)
+            or (config.max_files and len(self._storage) > config.max_files)
+        )
+
+    def wake(self) -> None:
+        if self._config.enabled:
+            self._wakeup.set()
+
+    def collect(self) -> List[RunEntry]:
+        with self._lock:
+            selected = select_run_evictions(self._storage.entries(), self._config, time.time())
+            # A job pinned since the snapshot was taken is skipped by ``evict``.
+            evicted = self._storage.evict((entry.id for entry in selected), self._delete)
+            if evicted:
+                self._storage.compact()
+            self._runs += 1
+            self._last_run = time.time()
+            self._last_evicted = len(evicted)
+            self._evicted_files += len(evicted)
+            self._evicted_bytes += sum(entry.size for entry in evicted)
+        if evicted:
+            logger.info("Collected %d outputs (%d bytes)", len(evicted), sum(entry.size for entry in evicted))
+            self._on_evicted(evicted)
+        return evicted
+
+    def _delete(self, entry: RunEntry) -> None:
+        path = self._storage.root / entry.path
+        for target in (path, path.with_suffix(".json")):
+            try:
+                target.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.warning("Unable to delete %s", target, exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._storage.entries()
+        config = self._config
+        return {
+            "enabled": config.enabled,
+            "files": len(entries),
+            "bytes": sum(entry.size for entry in entries),
+            "pinned": sum(1 for entry in entries if entry.pinned),
+            "maxBytes": config.max_bytes or None,
+            "maxFiles": config.max_files or None,
+            "maxAgeSeconds": config.max_age_seconds or None,
+            "runs": self._runs,
+            "lastRun": self._last_run,
+            "lastEvicted": self._last_evicted,
+            "evictedFiles": self._evicted_files,
+            "evictedBytes": self._evicted_bytes,
+        }
+
+    def _loop(self) -> None:
+        while True:
+            self._wakeup.wait(self._config.interval)
+            self._wakeup.clear()
+            try:
+                self.collect()
+            except Exception:  # pragma: no cover - keep collecting on the next pass
+                logger.exception("Output garbage collection failed")
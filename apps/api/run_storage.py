@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+MANIFEST_NAME = ".manifest.jsonl"
+IMAGE_SUFFIXES = (".png", ".webp", ".jpg", ".jpeg", ".avif")
+# Outputs and their derivatives never change once published under a job id.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunEntry:
+    id: str
+    path: str  # relative to the runs root, always with forward slashes
+    size: int
+    created: float
+    model: Optional[str] = None
+    promptHash: Optional[str] = None
+    pinned: bool = False
+    # Last time the image was served; kept in memory and written out when the manifest is compacted.
+    accessed: Optional[float] = None
+
+
+def strong_etag(path: Path, stat: os.stat_result) -> str:
+    return f'"{path.stem}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def prompt_hash(prompt: Optional[str]) -> Optional[str]:
+    if not prompt:
+        return None
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class RunStorage:
+    """Outputs sharded as ``runs/YYYY/MM/DD/<id[:2]>/<id>.<ext>`` plus an append-only manifest.
+
+    ``.manifest.jsonl`` maps job ids to their file and is the only thing history needs to read;
+    removals are appended as tombstones and the file is compacted at startup. ``rebuild``
+    recreates it from the shard directories. Flat files from older releases are moved into
+    shards on startup.
+    """
+
+    def __init__(self, root: Path):
+        self._root = root
+        self._manifest = root / MANIFEST_NAME
+        self._entries: Dict[str, RunEntry] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        root.mkdir(parents=True, exist_ok=True)
+        lines = self._load()
+        migrated = self._migrate_flat()
+        if not self._manifest.exists() and not self._entries:
+            self.rebuild()
+        elif migrated or lines > 2 * len(self._entries) + 100:
+            self.compact()
+        self._bytes = sum(entry.size for entry in self._entries.values())
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def path_for(self, job_id: str, created: Optional[datetime] = None, suffix: str = ".png") -> Path:
+        created = created or datetime.utcnow()
+        return self._root / created.strftime("%Y/%m/%d") / job_id[:2] / f"{job_id}{suffix}"
+
+    def record(
+        self,
+        job_id: str,
+        path: Path,
+        model: Optional[str] = None,
+        prompt: Optional[str] = None,
+        pinned: bool = False,
+    ) -> RunEntry:
+        stat = path.stat()
+        entry = RunEntry(
+            id=job_id,
+            path=path.relative_to(self._root).as_posix(),
+            size=stat.st_size,
+            created=stat.st_mtime,
+            model=model,
+            promptHash=prompt_hash(prompt),
+            pinned=pinned,
+        )
+        with self._lock:
+            previous = self._entries.get(job_id)
+            if previous:
+                entry.pinned = entry.pinned or previous.pinned
+                self._bytes -= previous.size
+            self._entries[job_id] = entry
+            self._bytes += entry.size
+            self._append([asdict(entry)])
+        return entry
+
+    def touch(self, job_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry:
+                entry.accessed = time.time()
+
+    def set_pinned(self, job_id: str, pinned: bool) -> Optional[RunEntry]:
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None or entry.pinned == pinned:
+                return entry
+            entry.pinned = pinned
+            self._append([asdict(entry)])
+            return entry
+
+    def forget(self, job_ids: Iterable[str]) -> List[RunEntry]:
+        """Drop entries from the manifest (files are left to the caller)."""
+        removed: List[RunEntry] = []
+        with self._lock:
+            for job_id in job_ids:
+                entry = self._entries.pop(job_id, None)
+                if entry:
+                    removed.append(entry)
+                    self._bytes -= entry.size
+            if removed:
+                self._append([{"id": entry.id, "deleted": True} for entry in removed])
+        return removed
+
+    def evict(self, job_ids: Iterable[str], remove: Callable[[RunEntry], None]) -> List[RunEntry]:
+        """Delete and forget unpinned entries; the pin is re-checked under the lock for each one."""
+        removed: List[RunEntry] = []
+        with self._lock:
+            for job_id in job_ids:
+                entry = self._entries.get(job_id)
+                if entry is None or entry.pinned:
+                    continue
+                remove(entry)
+                del self._entries[job_id]
+                self._bytes -= entry.size
+                removed.append(entry)
+            if removed:
+                self._append([{"id": entry.id, "deleted": True} for entry in removed])
+        return removed
+
+    def compact(self) -> None:
+        with self._lock:
+            self._rewrite_locked()
+
+    def get(self, job_id: str) -> Optional[RunEntry]:
+        with self._lock:
+            return self._entries.get(job_id)
+
+    def entries(self) -> List[RunEntry]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def resolve(self, job_id: str) -> Optional[Path]:
+        entry = self.get(job_id)
+        return self._root / entry.path if entry else None
+
+    def resolve_name(self, name: str) -> Optional[Path]:
+        """Map a flat ``<id>.<ext>`` URL name onto its shard."""
+        entry = self.get(name.split(".", 1)[0])
+        if entry and entry.path.rsplit("/", 1)[-1] == name:
+            return self._root / entry.path
+        return None
+
+    def rebuild(self) -> int:
+        """Recreate the manifest by walking the shard directories."""
+        found: Dict[str, RunEntry] = {}
+        with self._lock:
+            known = dict(self._entries)
+        for path in self._shard_files():
+            stat = path.stat()
+            previous = known.get(path.stem)
+            found[path.stem] = RunEntry(
+                id=path.stem,
+                path=path.relative_to(self._root).as_posix(),
+                size=stat.st_size,
+                created=stat.st_mtime,
+                model=previous.model if previous else None,
+                promptHash=previous.promptHash if previous else None,
+                pinned=previous.pinned if previous else False,
+                accessed=previous.accessed if previous else None,
+            )
+        with self._lock:
+            self._entries = found
+            self._bytes = sum(entry.size for entry in found.values())
+            self._rewrite_locked()
+        return len(found)
+
+    # Internal helpers ------------------------------------------------------------
+    def _shard_files(self) -> Iterable[Path]:
+        for year in self._root.iterdir():
+            if not (year.is_dir() and year.name.isdigit()):
+                continue
+            for path in year.glob("*/*/*/*"):
+                if path.suffix.lower() in IMAGE_SUFFIXES and path.is_file():
+                    yield path
+
+    def _load(self) -> int:
+        """Replay the manifest; returns the number of lines read."""
+        lines = 0
+        try:
+            handle = self._manifest.open("r", encoding="utf-8")
+        except FileNotFoundError:
+            return 0
+        with handle:
+            for line in handle:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash; the next compaction drops it.
+                    continue
+                if not isinstance(record, dict) or "id" not in record:
+                    continue
+                if record.get("deleted"):
+                    self._entries.pop(record["id"], None)
+                    continue
+                try:
+                    self._entries[record["id"]] = RunEntry(**record)
+                except TypeError:
+                    continue
+        return lines
+
+    def _migrate_flat(self) -> int:
+        moved = 0
+        for path in list(self._root.iterdir()):
+            if path.suffix.lower() not in IMAGE_SUFFIXES or not path.is_file():
+                continue
+            created = datetime.utcfromtimestamp(path.stat().st_mtime)
+            target = self.path_for(path.stem, created, path.suffix)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, target)
+            sidecar = path.with_suffix(".json")
+            if sidecar.exists():
+                os.replace(sidecar, target.with_suffix(".json"))
+            stat = target.stat()
+            self._entries[path.stem] = RunEntry(
+                id=path.stem, path=target.relative_to(self._root).as_posix(), size=stat.st_size, created=stat.st_mtime
+            )
+            moved += 1
+        if moved:
+            logger.info("Moved %d flat outputs into dated shards", moved)
+        return moved
+
+    def _rewrite_locked(self) -> None:
+        temp = self._manifest.with_name(f"{MANIFEST_NAME}.tmp")
+        with temp.open("w", encoding="utf-8") as handle:
+            for entry in self._entries.values():
+                handle.write(json.dumps(asdict(entry), separators=(",", ":")) + "\n")
+        os.replace(temp, self._manifest)
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        with self._manifest.open("a", encoding="utf-8") as handle:
+            for record in records:
+                handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+class RunsStaticFiles(StaticFiles):
+    """``/runs`` mount that serves flat ``/runs/<id>.<ext>`` URLs out of their shard.
+
+    Files are sent with a strong ETag and an immutable ``Cache-Control``; ``FileResponse``
+    answers ``Range`` requests.
+    """
+
+    def __init__(self, *, storage: RunStorage, **kwargs: Any):
+        super().__init__(directory=str(storage.root), **kwargs)
+        self._storage = storage
+
+    def lookup_path(self, path: str) -> Tuple[str, Optional[os.stat_result]]:
+        if any(part.startswith(".") for part in path.replace("\\", "/").split("/")):
+            # The manifest, result cache, thumbnails and temp files are not public.
+            return "", None
+        if "/" not in path and "\\" not in path:
+            resolved = self._storage.resolve_name(path)
+            if resolved is not None:
+                try:
+                    found = str(resolved), resolved.stat()
+                    self._storage.touch(resolved.stem)
+                    return found
+                except OSError:
+                    pass
+        return super().lookup_path(path)
+
+    def file_response(
+        self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        headers = {"cache-control": IMMUTABLE_CACHE_CONTROL, "etag": strong_etag(Path(full_path), stat_result)}
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
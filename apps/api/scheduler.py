@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from .config import int_option, section
+
+DEFAULT_CLIENT = "anonymous"
+
+# (-priority, seq, job_id): sorts highest priority first, then submission order.
+_Key = Tuple[int, int, str]
+
+
+@dataclass(frozen=True)
+class SchedulerConfig:
+    default_priority: int = 0
+    min_priority: int = -10
+    max_priority: int = 10
+    client_weights: Dict[str, int] = field(default_factory=dict)
+    default_weight: int = 1
+
+
+def load_scheduler_config() -> SchedulerConfig:
+    raw = section("scheduler")
+    defaults = SchedulerConfig()
+    weights = raw.get("client_weights")
+    min_priority = int_option(raw.get("min_priority"), defaults.min_priority)
+    max_priority = max(min_priority, int_option(raw.get("max_priority"), defaults.max_priority))
+    return SchedulerConfig(
+        default_priority=min(
+            max_priority, max(min_priority, int_option(raw.get("default_priority"), defaults.default_priority))
+        ),
+        min_priority=min_priority,
+        max_priority=max_priority,
+        client_weights={
+            str(client): max(1, int_option(weight, 1)) for client, weight in (weights or {}).items()
+        }
+        if isinstance(weights, dict)
+        else {},
+        default_weight=max(1, int_option(raw.get("default_weight"), defaults.default_weight)),
+    )
+
+
+class _ClientQueue:
+    __slots__ = ("client", "weight", "entries", "credit")
+
+    def __init__(self, client: str, weight: int, entries: Optional[Sequence[_Key]] = None, credit: int = 0):
+        self.client = client
+        self.weight = weight
+        self.entries: Any = list(entries) if entries is not None else []
+        self.credit = credit
+
+
+def _pick(queues: Sequence[_ClientQueue]) -> _ClientQueue:
+    """Smooth weighted round-robin among the clients whose next job has the top priority."""
+    top = min(queue.entries[0][0] for queue in queues)
+    contenders = [queue for queue in queues if queue.entries[0][0] == top]
+    total = 0
+    best = contenders[0]
+    for queue in contenders:
+        queue.credit += queue.weight
+        total += queue.weight
+        if queue.credit > best.credit:
+            best = queue
+    best.credit -= total
+    return best
+
+
+class Scheduler:
+    """Queued job ids ordered by priority, then shared fairly between clients.
+
+    Higher priorities always go first. Among jobs of the same priority each client gets
+    turns in proportion to its weight, so one client's bulk submission cannot starve the
+    others. Jobs can be removed or re-prioritized while queued; ``position`` reports where a
+    job currently sits in the dispatch order.
+    """
+
+    def __init__(self, config: SchedulerConfig):
+        self._config = config
+        self._clients: Dict[str, _ClientQueue] = {}
+        self._where: Dict[str, Tuple[str, _Key]] = {}
+        self._version = 0
+        self._order: Tuple[int, List[str]] = (-1, [])
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._where)
+
+    def __contains__(self, job_id: str) -> bool:
+        with self._cond:
+            return job_id in self._where
+
+    def clamp(self, priority: Optional[int]) -> int:
+        if priority is None:
+            return self._config.default_priority
+        return min(self._config.max_priority, max(self._config.min_priority, priority))
+
+    # Mutation --------------------------------------------------------------------
+    def push(self, job_id: str, client: Optional[str], priority: int, seq: int) -> None:
+        client = client or DEFAULT_CLIENT
+        key: _Key = (-priority, seq, job_id)
+        with self._cond:
+            if job_id in self._where:
+                return
+            queue = self._clients.get(client)
+            if queue is None:
+                weight = self._config.client_weights.get(client, self._config.default_weight)
+                queue = self._clients[client] = _ClientQueue(client, weight)
+            insort(queue.entries, key)
+            self._where[job_id] = (client, key)
+            self._changed_locked()
+
+    def remove(self, job_id: str) -> bool:
+        with self._cond:
+            removed = self._remove_locked(job_id)
+            if removed:
+                self._changed_locked()
+            return removed
+
+    def reprioritize(self, job_id: str, priority: int) -> bool:
+        with self._cond:
+            located = self._where.get(job_id)
+            if located is None:
+                return False
+            client, key = located
+            self._remove_locked(job_id)
+            new_key: _Key = (-priority, key[1], job_id)
+            queue = self._clients.get(client)
+            if queue is None:
+                weight = self._config.client_weights.get(client, self._config.default_weight)
+                queue = self._clients[client] = _ClientQueue(client, weight)
+            insort(queue.entries, new_key)
+            self._where[job_id] = (client, new_key)
+            self._changed_locked()
+            return True
+
+    def pop(
+        self,
+        timeout: Optional[float] = None,
+        choose: Optional[Callable[[List[str]], Optional[str]]] = None,
+        lookahead: int = 1,
+    ) -> Optional[str]:
+        """Take the next job id, waiting up to ``timeout`` seconds (forever when ``None``).
+
+        ``choose`` sees up to ``lookahead`` ids in dispatch order, limited to those sharing the
+        head's priority, and may return one of them to take instead of the head; returning
+        ``None`` keeps the normal order. Priorities are never inverted.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._where:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if choose is not None and lookahead > 1:
+                ordered = self._simulate_locked(lookahead)
+                top = self._where[ordered[0]][1][0]
+                ordered = list(itertools.takewhile(lambda job_id: self._where[job_id][1][0] == top, ordered))
+                chosen = choose(ordered)
+                if chosen is not None and chosen != ordered[0] and self._remove_locked(chosen):
+                    self._changed_locked()
+                    return chosen
+            queue = _pick(list(self._clients.values()))
+            _, _, job_id = queue.entries.pop(0)
+            del self._where[job_id]
+            if not queue.entries:
+                del self._clients[queue.client]
+            self._changed_locked()
+            return job_id
+
+    # Inspection ------------------------------------------------------------------
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def wait(self, version: int, timeout: float) -> int:
+        """Block until the queue changes after ``version`` or ``timeout`` passes."""
+        with self._cond:
+            if self._version == version and timeout > 0:
+                self._cond.wait(timeout)
+            return self._version
+
+    def ordered(self, limit: Optional[int] = None) -> List[str]:
+        """Queued job ids in the order ``pop`` would return them (assuming no new arrivals).
+
+        The full order is simulated at most once per queue change; bounded lookups reuse it.
+        """
+        with self._cond:
+            version, order = self._order
+            if version != self._version:
+                if limit is not None:
+                    return self._simulate_locked(limit)
+                order = self._simulate_locked(None)
+                self._order = (self._version, order)
+            return list(order if limit is None else order[:limit])
+
+    def queued_for(self, client: Optional[str]) -> int:
+        with self._cond:
+            queue = self._clients.get(client or DEFAULT_CLIENT)
+            return len(queue.entries) if queue else 0
+
+    def position(self, job_id: str) -> Optional[int]:
+        return self.positions().get(job_id)
+
+    def positions(self) -> Dict[str, int]:
+        """1-based dispatch positions."""
+        return {job_id: index for index, job_id in enumerate(self.ordered(), 1)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queued": len(self._where),
+                "clients": {client: len(queue.entries) for client, queue in self._clients.items()},
+            }
+
+    # Internal helpers ------------------------------------------------------------
+    def _changed_locked(self) -> None:
+        self._version += 1
+        self._cond.notify_all()
+
+    def _remove_locked(self, job_id: str) -> bool:
+        located = self._where.pop(job_id, None)
+        if located is None:
+            return False
+        client, key = located
+        queue = self._clients[client]
+        index = bisect_left(queue.entries, key)
+        del queue.entries[index]
+        if not queue.entries:
+            del self._clients[client]
+        return True
+
+    def _simulate_locked(self, limit: Optional[int]) -> List[str]:
+        queues = [
+            _ClientQueue(queue.client, queue.weight, credit=queue.credit) for queue in self._clients.values()
+        ]
+        for simulated, queue in zip(queues, self._clients.values()):
+            simulated.entries = deque(queue.entries)
+        order: List[str] = []
+        total = len(self._where) if limit is None else min(limit, len(self._where))
+        while len(order) < total:
+            queue = _pick(queues)
+            entries: Deque[_Key] = queue.entries
+            order.append(entries.popleft()[2])
+            if not entries:
+                queues.remove(queue)
+        return order
@@ -2,11 +2,17 @@ from __future__ import annotations
 
 import copy
 import json
+import logging
+import os
+import tempfile
+import threading
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 APP_DIR = Path(__file__).resolve().parent
 SETTINGS_PATH = APP_DIR / "settings.json"
+# Saves landing within this window are written to disk once.
+WRITE_DEBOUNCE_SECONDS = 0.25
 
 DEFAULT_SETTINGS: Dict[str, Any] = {
     "compile": {"enabled": True, "backend": "triton"},
@@ -14,9 +20,12 @@ DEFAULT_SETTINGS: Dict[str, Any] = {
     "attention": {"sage": True},
     "performance": {"xformers": False, "sdpa": True},
     "model": {"name": None},
+    "output": {"format": "png", "quality": 90, "lossless": False, "metadata": "embed"},
     "ui": {"mobile_compact": True},
 }
 
+logger = logging.getLogger(__name__)
+
 
 def _deep_merge(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
     for key, value in overrides.items():
@@ -36,25 +45,194 @@ def _ensure_defaults(data: Dict[str, Any]) -> Dict[str, Any]:
     return _deep_merge(merged, data)
 
 
-def load_settings() -> Dict[str, Any]:
-    if not SETTINGS_PATH.exists():
-        save_settings(DEFAULT_SETTINGS)
-        return copy.deepcopy(DEFAULT_SETTINGS)
+def _readonly(*_: Any, **__: Any) -> None:
+    raise TypeError("settings snapshots are read-only; use thaw() and save_settings()")
+
+
+class FrozenDict(dict):
+    """A ``dict`` that refuses mutation, so one snapshot can be shared by every reader.
+
+    It still serializes as a plain JSON object. ``copy.deepcopy`` returns mutable plain dicts.
+    """
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[str, Any]:
+        return thaw(self)
+
+    def __reduce__(self):
+        return (dict, (thaw(self),))
+
+
+class SettingsSnapshot(FrozenDict):
+    """Immutable settings document tagged with the store version it was taken at."""
+
+    __slots__ = ("version",)
+
+    def __init__(self, data: Dict[str, Any], version: int):
+        super().__init__(data)
+        self.version = version
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Return a mutable deep copy of a (possibly frozen) settings value."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+class SettingsStore:
+    """In-memory settings cache over ``settings.json``.
+
+    Readers get a shared immutable snapshot; the file is only re-parsed when its mtime or size
+    changes behind our back. Saves update memory immediately and hit disk once per debounce
+    window through a temp file and an atomic rename.
+    """
+
+    def __init__(self, path: Path = SETTINGS_PATH, debounce: float = WRITE_DEBOUNCE_SECONDS):
+        self._path = path
+        self._debounce = debounce
+        self._lock = threading.RLock()
+        self._snapshot: Optional[SettingsSnapshot] = None
+        self._version = 0
+        self._file_stamp: Optional[Tuple[int, int]] = None
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._subscribers: List[Callable[[SettingsSnapshot], None]] = []
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def load(self) -> SettingsSnapshot:
+        with self._lock:
+            if self._snapshot is not None and (self._dirty or self._stamp() == self._file_stamp):
+                return self._snapshot
+            changed = self._snapshot is not None
+            data, valid = self._read()
+            snapshot = self._replace(data)
+            if not valid:
+                self._write()
+        if changed:
+            self._notify(snapshot)
+        return snapshot
+
+    def save(self, data: Dict[str, Any]) -> SettingsSnapshot:
+        with self._lock:
+            snapshot = self._replace(_ensure_defaults(thaw(data)))
+            self._dirty = True
+            self._schedule_write()
+        self._notify(snapshot)
+        return snapshot
+
+    def flush(self) -> None:
+        """Write pending changes now; called on shutdown."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                self._write()
+
+    def subscribe(self, callback: Callable[[SettingsSnapshot], None]) -> Callable[[], None]:
+        """Call ``callback(snapshot)`` on every change; returns an unsubscribe function."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    # Internal helpers ------------------------------------------------------------
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self._path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self) -> Tuple[Dict[str, Any], bool]:
+        """Parse the file; a missing or corrupt file yields defaults and ``False``."""
+        try:
+            loaded = json.loads(self._path.read_text(encoding="utf-8"))
+            if not isinstance(loaded, dict):
+                raise ValueError("settings.json must contain an object")
+        except (OSError, json.JSONDecodeError, ValueError):
+            return copy.deepcopy(DEFAULT_SETTINGS), False
+        return _ensure_defaults(loaded), True
+
+    def _replace(self, data: Dict[str, Any]) -> SettingsSnapshot:
+        self._version += 1
+        frozen = {key: _freeze(value) for key, value in data.items()}
+        self._snapshot = SettingsSnapshot(frozen, self._version)
+        self._file_stamp = self._stamp()
+        return self._snapshot
+
+    def _schedule_write(self) -> None:
+        if self._timer is not None:
+            return
+        self._timer = threading.Timer(self._debounce, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_from_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            if self._dirty:
+                self._write()
+
+    def _write(self) -> None:
+        text = json.dumps(self._snapshot, indent=2, sort_keys=True)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(prefix=f".{self._path.name}.", dir=str(self._path.parent))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(text)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temp_name, self._path)
+        except OSError:
+            logger.exception("Failed to write %s", self._path)
+            try:
+                os.unlink(temp_name)
+            except OSError:
+                pass
+            return
+        self._dirty = False
+        self._file_stamp = self._stamp()
+
+    def _notify(self, snapshot: SettingsSnapshot) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception:  # pragma: no cover - subscriber bugs must not break saves
+                logger.exception("Settings subscriber failed")
+
 
-    try:
-        loaded = json.loads(SETTINGS_PATH.read_text(encoding="utf-8"))
-        if not isinstance(loaded, dict):
-            raise ValueError("settings.json must contain an object")
-    except (json.JSONDecodeError, ValueError):
-        save_settings(DEFAULT_SETTINGS)
-        return copy.deepcopy(DEFAULT_SETTINGS)
+settings_store = SettingsStore()
 
-    return _ensure_defaults(loaded)
 
+def load_settings() -> SettingsSnapshot:
+    return settings_store.load()
 
-def save_settings(data: Dict[str, Any]) -> None:
-    normalized = _ensure_defaults(data)
-    SETTINGS_PATH.write_text(
-        json.dumps(normalized, indent=2, sort_keys=True), encoding="utf-8"
-    )
 
+def save_settings(data: Dict[str, Any]) -> SettingsSnapshot:
+    return settings_store.save(data)
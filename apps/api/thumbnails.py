@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import bool_option, int_option, section
+from .output_format import SUFFIXES, Encoder
+
+DEFAULT_WIDTHS = (128, 256, 512, 1024)
+MEDIA_TYPES = {".webp": "image/webp", ".jpg": "image/jpeg", ".png": "image/png", ".avif": "image/avif"}
+
+
+@dataclass(frozen=True)
+class ThumbConfig:
+    enabled: bool = True
+    widths: Tuple[int, ...] = DEFAULT_WIDTHS
+    default_width: int = 256
+    format: str = "webp"
+    quality: int = 75
+    max_bytes: int = 256 * 1024 ** 2
+    workers: int = 2
+    pregenerate: bool = True
+
+
+def load_thumb_config() -> ThumbConfig:
+    raw = section("thumbnails")
+    defaults = ThumbConfig()
+    widths = raw.get("widths")
+    if isinstance(widths, list):
+        parsed = sorted({int_option(width, 0) for width in widths} - {0})
+    else:
+        parsed = list(defaults.widths)
+    fmt = str(raw.get("format") or defaults.format).lower()
+    return ThumbConfig(
+        enabled=bool_option(raw.get("enabled"), defaults.enabled),
+        widths=tuple(width for width in parsed if width > 0) or defaults.widths,
+        default_width=int_option(raw.get("default_width"), defaults.default_width),
+        format=fmt if fmt in SUFFIXES else defaults.format,
+        quality=min(100, max(1, int_option(raw.get("quality"), defaults.quality))),
+        max_bytes=max(0, int_option(raw.get("max_bytes"), defaults.max_bytes)),
+        workers=max(1, int_option(raw.get("workers"), defaults.workers)),
+        pregenerate=bool_option(raw.get("pregenerate"), defaults.pregenerate),
+    )
+
+
+def make_thumbnail(source: str, destination: str, width: int, fmt: str, quality: int) -> int:
+    """Write a ``width``-wide derivative of ``source``; runs in an encoder process."""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, width * 4))
+        if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        options: Dict[str, Any] = {"quality": quality}
+        if fmt == "webp":
+            options["method"] = 4
+        elif fmt == "png":
+            options = {"optimize": True}
+        image.save(destination, format="JPEG" if fmt == "jpeg" else fmt.upper(), **options)
+    return os.path.getsize(destination)
+
+
+class ThumbnailCache:
+    """Resized derivatives of outputs, generated once and kept in a size-bounded disk LRU.
+
+    Requests for the same derivative while it is being generated share one future.
+    """
+
+    def __init__(self, root: Path, config: ThumbConfig, encoder: Encoder):
+        self._root = root
+        self._config = config
+        self._encoder = encoder
+        self._entries: "OrderedDict[str, Tuple[Path, int]]" = OrderedDict()
+        self._flights: Dict[str, "Future[Path]"] = {}
+        self._bytes = 0
+        self._generated = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=config.workers, thread_name_prefix="codex-thumbnails")
+        if self.enabled:
+            self._root.mkdir(parents=True, exist_ok=True)
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.enabled and self._encoder.available
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[SUFFIXES[self._config.format]]
+
+    def snap_width(self, width: Optional[int]) -> int:
+        """Round a requested width up to a configured size so the cache stays small."""
+        if not width:
+            return self._config.default_width
+        return next((size for size in self._config.widths if size >= width), self._config.widths[-1])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "inFlight": len(self._flights),
+                "generated": self._generated,
+            }
+
+    def get(self, job_id: str, source: Path, width: Optional[int] = None) -> "Future[Path]":
+        """Future for the derivative of ``source``; resolves to ``source`` itself when disabled."""
+        if not self.enabled:
+            done: "Future[Path]" = Future()
+            done.set_result(source)
+            return done
+        name = f"{job_id}-{self.snap_width(width)}{SUFFIXES[self._config.format]}"
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry[0].exists():
+                self._entries.move_to_end(name)
+                done = Future()
+                done.set_result(entry[0])
+                return done
+            flight = self._flights.get(name)
+            if flight is None:
+                flight = self._pool.submit(self._generate, name, source, self.snap_width(width))
+                self._flights[name] = flight
+        return flight
+
+    def pregenerate(self, job_id: str, source: Path) -> None:
+        if self._config.pregenerate and self.enabled:
+            self.get(job_id, source)
+
+    def discard(self, job_ids: List[str]) -> None:
+        """Delete every derivative of the given jobs, e.g. after their output was collected."""
+        prefixes = tuple(f"{job_id}-" for job_id in job_ids)
+        if not prefixes:
+            return
+        removed: List[Path] = []
+        with self._lock:
+            for name in [name for name in self._entries if name.startswith(prefixes)]:
+                path, size = self._entries.pop(name)
+                self._bytes -= size
+                removed.append(path)
+        for path in removed:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # Internal helpers ------------------------------------------------------------
+    def _generate(self, name: str, source: Path, width: int) -> Path:
+        target = self._root / name
+        temp = self._root / f".{name}.tmp"
+        try:
+            size = self._encoder.run(
+                make_thumbnail, str(source), str(temp), width, self._config.format, self._config.quality
+            )
+            os.replace(temp, target)
+        except BaseException:
+            try:
+                temp.unlink()
+            except OSError:
+                pass
+            with self._lock:
+                self._flights.pop(name, None)
+            raise
+        with self._lock:
+            self._flights.pop(name, None)
+            previous = self._entries.pop(name, None)
+            if previous:
+                self._bytes -= previous[1]
+            self._entries[name] = (target, size)
+            self._bytes += size
+            self._generated += 1
+            evicted = self._evict_locked()
+        for path in evicted:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        return target
+
+    def _evict_locked(self) -> List[Path]:
+        evicted: List[Path] = []
+        while len(self._entries) > 1 and self._bytes > self._config.max_bytes:
+            _, (path, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            evicted.append(path)
+        return evicted
+
+    def _load(self) -> None:
+        found = []
+        for path in self._root.iterdir():
+            if path.name.startswith("."):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_atime, path, stat.st_size))
+        found.sort(key=lambda item: item[0])
+        with self._lock:
+            for _, path, size in found:
+                self._entries[path.name] = (path, size)
+                self._bytes += size
+            evicted = self._evict_locked()
+        for path in evicted:
+            try:
+                path.unlink()
+            except OSError:
+                pass
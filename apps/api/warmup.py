@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from .adapters import sdnext
+from .backends import Backend, BackendPool, is_unreachable
+from .config import bool_option, float_option, int_option, section
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between attempts to reach a backend that is not up yet.
+_MAX_RETRY_SECONDS = 300.0
+
+
+@dataclass(frozen=True)
+class WarmupConfig:
+    enabled: bool = True
+    # Load the default checkpoint from settings.json when the API starts.
+    load_default: bool = True
+    # Run a small generation after each load so compiled kernels exist before real traffic.
+    generate: bool = True
+    prompt: str = "warm-up"
+    steps: int = 4
+    width: int = 512
+    height: int = 512
+    # Preload the checkpoint the queue (or recent demand) needs next on idle backends.
+    predictive: bool = True
+    idle_seconds: float = 10.0
+    interval: float = 5.0
+
+
+def load_warmup_config() -> WarmupConfig:
+    raw = section("warmup")
+    defaults = WarmupConfig()
+    return WarmupConfig(
+        enabled=bool_option(raw.get("enabled"), defaults.enabled),
+        load_default=bool_option(raw.get("load_default"), defaults.load_default),
+        generate=bool_option(raw.get("generate"), defaults.generate),
+        prompt=str(raw.get("prompt") or defaults.prompt),
+        steps=max(1, int_option(raw.get("steps"), defaults.steps)),
+        width=max(64, int_option(raw.get("width"), defaults.width)),
+        height=max(64, int_option(raw.get("height"), defaults.height)),
+        predictive=bool_option(raw.get("predictive"), defaults.predictive),
+        idle_seconds=max(0.0, float_option(raw.get("idle_seconds")) or defaults.idle_seconds),
+        interval=float_option(raw.get("interval_seconds")) or defaults.interval,
+    )
+
+
+class ModelWarmer:
+    """Loads checkpoints before the jobs that need them arrive.
+
+    On startup (and whenever the default model changes) every backend loads the default
+    checkpoint and runs a tiny generation. Afterwards, a backend that has been idle for
+    ``idle_seconds`` preloads whatever ``predict`` says will be needed next. Loads only
+    start on backends with no batch executing, and batches wait for a load in progress.
+    """
+
+    def __init__(
+        self,
+        backends: BackendPool,
+        config: WarmupConfig,
+        preload: Callable[[Backend, str], bool],
+        predict: Callable[[Backend], Optional[str]],
+        default_model: Callable[[], Optional[str]],
+    ):
+        self._backends = backends
+        self._config = config
+        self._preload = preload
+        self._predict = predict
+        self._default_model = default_model
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._warmed: Dict[str, Set[str]] = {}
+        self._loads = 0
+        self._predicted = 0
+        self._generations = 0
+        self._last_error: Optional[str] = None
+        # Backend name -> (monotonic time of the next attempt, current backoff) while unreachable.
+        self._retry: Dict[str, Tuple[float, float]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not self._config.enabled or self._thread is not None:
+            return
+        if self._config.load_default:
+            with self._lock:
+                self._pending.update(backend.name for backend in self._backends.backends)
+        self._thread = threading.Thread(target=self._loop, name="codex-model-warmup", daemon=True)
+        self._thread.start()
+        self._wakeup.set()
+
+    def load_default(self) -> List[str]:
+        """Queue the (new) default checkpoint on every backend; returns their names."""
+        if not self._config.enabled:
+            return []
+        names = [backend.name for backend in self._backends.backends]
+        with self._lock:
+            self._pending.update(names)
+        self.start()
+        self._wakeup.set()
+        return names
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self._config.enabled,
+                "pending": sorted(self._pending),
+                "warmed": {name: sorted(models) for name, models in self._warmed.items()},
+                "loads": self._loads,
+                "predictedLoads": self._predicted,
+                "generations": self._generations,
+                "lastError": self._last_error,
+                "retrying": sorted(self._retry),
+            }
+
+    # Internal helpers ------------------------------------------------------------
+    def _loop(self) -> None:
+        while True:
+            self._wakeup.wait(self._config.interval)
+            self._wakeup.clear()
+            for backend in self._backends.backends:
+                try:
+                    self._tend(backend)
+                except Exception:  # pragma: no cover - try again on the next pass
+                    logger.exception("Warm-up of backend %s failed", backend.name)
+
+    def _tend(self, backend: Backend) -> None:
+        with self._lock:
+            pending = backend.name in self._pending
+            retry_at, _ = self._retry.get(backend.name, (0.0, 0.0))
+        if time.monotonic() < retry_at:
+            return
+        if pending:
+            model = self._default_model()
+            if not model:
+                with self._lock:
+                    self._pending.discard(backend.name)
+                return
+            if self._warm(backend, model, idle_for=0.0):
+                with self._lock:
+                    self._pending.discard(backend.name)
+            return
+        if not self._config.predictive:
+            return
+        model = self._predict(backend)
+        if model and not sdnext.model_matches(backend.loaded_model, model):
+            self._warm(backend, model, idle_for=self._config.idle_seconds, predicted=True)
+
+    def _warm(self, backend: Backend, model: str, idle_for: float, predicted: bool = False) -> bool:
+        """Load ``model`` and warm it up once; False when the backend was busy."""
+        if not self._backends.try_begin_warm(backend, idle_for):
+            return False
+        try:
+            loaded = self._preload(backend, model)
+            with self._lock:
+                self._loads += int(loaded)
+                self._predicted += int(loaded and predicted)
+                generate = self._config.generate and model not in self._warmed.get(backend.name, set())
+            if generate:
+                sdnext.txt2img(
+                    {
+                        "prompt": self._config.prompt,
+                        "steps": self._config.steps,
+                        "width": self._config.width,
+                        "height": self._config.height,
+                        "model": model,
+                    },
+                    backend.base_url,
+                )
+            with self._lock:
+                self._generations += int(generate)
+                self._warmed.setdefault(backend.name, set()).add(model)
+                self._retry.pop(backend.name, None)
+            logger.info("Backend %s warmed up %s", backend.name, model)
+            return True
+        except HTTPException as exc:
+            with self._lock:
+                self._last_error = f"{backend.name}: {exc.detail}"
+                if is_unreachable(exc):
+                    # SD.Next is often still starting; keep the load pending and back off.
+                    _, backoff = self._retry.get(backend.name, (0.0, 0.0))
+                    backoff = min(_MAX_RETRY_SECONDS, backoff * 2 if backoff else self._config.interval)
+                    self._retry[backend.name] = (time.monotonic() + backoff, backoff)
+            logger.warning("Unable to warm up %s on backend %s: %s", model, backend.name, exc.detail)
+            # Other failures are not retried in a loop; the next default change or prediction tries again.
+            return not is_unreachable(exc)
+        finally:
+            self._backends.end_warm(backend)
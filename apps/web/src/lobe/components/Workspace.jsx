@@ -771,7 +771,7 @@ function ExtensionsTab() {
 
 
 function HistoryTab() {
-  const { jobs, cancelJob } = useAppState();
+  const { jobs, cancelJob, apiBase } = useAppState();
 
   const activeJobs = useMemo(
     () => jobs.filter((job) => job.status === "queued" || job.status === "running"),
@@ -844,7 +844,17 @@ function HistoryTab() {
             <ul className="lobe-history">
               {recentJobs.map((job) => (
                 <li key={job.id} className={`lobe-history__item is-${job.status}`}>
-                  <div>
+                  {job.thumbUrl ? (
+                    <img
+                      className="lobe-history__thumb"
+                      src={`${apiBase}${job.thumbUrl}?w=128`}
+                      alt=""
+                      loading="lazy"
+                      width={64}
+                      height={64}
+                    />
+                  ) : null}
+                  <div className="lobe-history__body">
                     <strong>{job.prompt}</strong>
                     {job.negativePrompt ? (
                       <span className="lobe-history__meta"> - {job.negativePrompt}</span>
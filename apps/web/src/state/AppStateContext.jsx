@@ -1,4 +1,4 @@
-import { createContext, useCallback, useContext, useEffect, useMemo, useReducer, useRef } from "react";
+import { createContext, useCallback, useContext, useEffect, useMemo, useReducer, useRef, useState } from "react";
 
 import { API_BASE, apiDelete, apiGet, apiPost } from "../api/client";
 
@@ -47,12 +47,22 @@ function normalizeJob(job) {
     prompt: job.prompt ?? "",
     negativePrompt: job.negativePrompt ?? job.negative_prompt ?? null,
     model: job.model ?? null,
+    backend: job.backend ?? null,
     status,
     progress,
+    step: job.step ?? null,
+    totalSteps: job.totalSteps ?? null,
+    eta: job.eta ?? null,
     imageUrl: job.imageUrl ?? job.image_url ?? null,
+    thumbUrl: job.thumbUrl ?? null,
     meta: job.meta ?? null,
     settings: job.settings ?? null,
     error: job.error ?? null,
+    pinned: Boolean(job.pinned),
+    priority: job.priority ?? 0,
+    position: job.position ?? null,
+    estimatedStart: job.estimatedStart ?? null,
+    estimatedFinish: job.estimatedFinish ?? null,
     cancelRequested: job.cancelRequested ?? job.cancel_requested ?? false,
     createdAt: job.createdAt ?? job.created_at ?? new Date().toISOString(),
     startedAt: job.startedAt ?? job.started_at ?? null,
@@ -151,13 +161,15 @@ const AppStateContext = createContext(null);
 export function AppStateProvider({ children }) {
   const [state, dispatch] = useReducer(reducer, initialState);
   const pollingHandles = useRef(new Map());
+  const [streaming, setStreaming] = useState(false);
+  const streamingRef = useRef(false);
 
   const pollJob = useCallback(
     async (jobId) => {
       try {
         const job = await apiGet(`/jobs/${jobId}`);
         dispatch({ type: "JOB_UPDATE", payload: job });
-        if (job.status === "queued" || job.status === "running") {
+        if (!streamingRef.current && (job.status === "queued" || job.status === "running")) {
           const handle = window.setTimeout(() => pollJob(jobId), 800);
           pollingHandles.current.set(jobId, handle);
         } else {
@@ -196,7 +208,7 @@ export function AppStateProvider({ children }) {
           dispatch({ type: "EXTENSIONS_ERROR", error });
           return { items: [] };
         }),
-        apiGet("/jobs").catch((error) => {
+        apiGet("/jobs?view=summary").catch((error) => {
           dispatch({ type: "JOBS_ERROR", error });
           return { items: [] };
         }),
@@ -226,6 +238,35 @@ export function AppStateProvider({ children }) {
   }, [load]);
 
   useEffect(() => {
+    if (typeof window === "undefined" || !window.EventSource) {
+      return undefined;
+    }
+    const source = new window.EventSource(`${API_BASE}/jobs/events`);
+    const setConnected = (connected) => {
+      streamingRef.current = connected;
+      setStreaming(connected);
+    };
+    source.addEventListener("job", (event) => {
+      try {
+        dispatch({ type: "JOB_UPDATE", payload: JSON.parse(event.data) });
+      } catch (error) {
+        dispatch({ type: "JOBS_ERROR", error });
+      }
+    });
+    source.onopen = () => setConnected(true);
+    source.onerror = () => setConnected(false);
+    return () => {
+      source.close();
+      setConnected(false);
+    };
+  }, []);
+
+  useEffect(() => {
+    if (streaming) {
+      pollingHandles.current.forEach((handle) => window.clearTimeout(handle));
+      pollingHandles.current.clear();
+      return;
+    }
     state.jobs.forEach((job) => {
       const isActive = job.status === "queued" || job.status === "running";
       const existing = pollingHandles.current.get(job.id);
@@ -238,7 +279,7 @@ export function AppStateProvider({ children }) {
         pollingHandles.current.delete(job.id);
       }
     });
-  }, [state.jobs, pollJob]);
+  }, [state.jobs, pollJob, streaming]);
 
   const refreshModels = useCallback(async () => {
     try {
@@ -316,7 +357,9 @@ export function AppStateProvider({ children }) {
           const job = normalizeJob(response.job);
           const enrichedJob = { ...job, prompt: job.prompt || payload.prompt, negativePrompt: job.negativePrompt ?? payload.negative_prompt, model: job.model ?? payload.model };
           dispatch({ type: "JOB_ENQUEUE", payload: enrichedJob });
-          scheduleJobPoll(enrichedJob.id);
+          if (!streamingRef.current) {
+            scheduleJobPoll(enrichedJob.id);
+          }
           return enrichedJob;
         }
         const immediateJob = normalizeJob({